@@ -2,6 +2,8 @@ from django.db import connection
 from django.core.management.base import BaseCommand
 from pathlib import Path
 
+from addressbase.models import update_council_uprn_counts
+
 
 class Command(BaseCommand):
     """
@@ -28,4 +30,7 @@ class Command(BaseCommand):
         with self.path.open("r") as f:
             cursor.copy_from(f, self.table_name, sep=",")
 
+        self.stdout.write("counting UPRNs in each council..")
+        update_council_uprn_counts(cursor)
+
         self.stdout.write("...done")
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.17 on 2021-01-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("addressbase", "0016_join_uprntocouncil_to_address"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CouncilUprnCount",
+            fields=[
+                (
+                    "lad",
+                    models.CharField(max_length=9, primary_key=True, serialize=False),
+                ),
+                ("count", models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,3 +1,7 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
 from django.contrib.gis.db import models
 from uk_geo_utils.models import (
     AbstractAddress,
@@ -55,14 +59,112 @@ class UprnToCouncil(models.Model):
     polling_station_id = models.CharField(blank=True, max_length=255)
 
 
-def get_uprn_hash_table(council_id):
-    addresses = Address.objects.filter(uprntocouncil__lad=council_id)
-    # return result a hash table keyed by UPRN
-    return {
-        a.uprn: {
-            "address": a.address,
-            "postcode": a.postcode.replace(" ", ""),
-            "location": a.location,
-        }
-        for a in addresses
-    }
+class CouncilUprnCount(models.Model):
+    """
+    Number of UPRNs in each council, so importers can report it
+    without counting the council's addresses every time.
+    Kept up to date by import_uprn_council_lookup.
+    """
+
+    lad = models.CharField(primary_key=True, max_length=9)
+    count = models.IntegerField(default=0)
+
+
+def update_council_uprn_counts(cursor):
+    cursor.execute("TRUNCATE TABLE %s;" % (CouncilUprnCount._meta.db_table))
+    cursor.execute(
+        """
+        INSERT INTO {0} (lad, count)
+        SELECT lad, COUNT(*) FROM {1}
+        WHERE lad != ''
+        GROUP BY lad;
+        """.format(
+            CouncilUprnCount._meta.db_table, UprnToCouncil._meta.db_table
+        )
+    )
+
+
+def get_council_uprn_count(council_id):
+    try:
+        return CouncilUprnCount.objects.get(lad=council_id).count
+    except CouncilUprnCount.DoesNotExist:
+        # counts haven't been built yet: this is still an index scan
+        return UprnToCouncil.objects.filter(lad=council_id).count()
+
+
+class UprnPostcodeTable(Mapping):
+    """
+    Read-only mapping of UPRN -> postcode (without spaces)
+
+    A dict of strings costs ~100 bytes per address. Instead we keep
+    the UPRNs as a sorted array of ints, with a parallel array of
+    indexes into the list of distinct postcodes, and look UPRNs up
+    with a binary search: ~12 bytes per address.
+    """
+
+    def __init__(self, rows):
+        self.postcodes = []
+        # the odd UPRN which doesn't round-trip through int()
+        self.other = {}
+        postcode_indexes = {}
+        uprns = array("q")
+        indexes = array("L")
+
+        for uprn, postcode in rows:
+            postcode = postcode.replace(" ", "")
+            if postcode not in postcode_indexes:
+                postcode_indexes[postcode] = len(self.postcodes)
+                self.postcodes.append(postcode)
+            key = self.to_key(uprn)
+            if key is None:
+                self.other[uprn] = postcode
+                continue
+            uprns.append(key)
+            indexes.append(postcode_indexes[postcode])
+
+        order = sorted(range(len(uprns)), key=uprns.__getitem__)
+        self.uprns = array("q", (uprns[i] for i in order))
+        self.indexes = array("L", (indexes[i] for i in order))
+
+    def to_key(self, uprn):
+        if not isinstance(uprn, str) or not uprn.isdigit():
+            return None
+        key = int(uprn)
+        if str(key) != uprn:
+            # e.g: leading zeros. Leave these as strings
+            # so we only match exactly the same UPRN
+            return None
+        return key
+
+    def __getitem__(self, uprn):
+        key = self.to_key(uprn)
+        if key is None:
+            return self.other[uprn]
+        i = bisect_left(self.uprns, key)
+        if i == len(self.uprns) or self.uprns[i] != key:
+            raise KeyError(uprn)
+        return self.postcodes[self.indexes[i]]
+
+    def __iter__(self):
+        for key in self.uprns:
+            yield str(key)
+        yield from self.other
+
+    def __len__(self):
+        return len(self.uprns) + len(self.other)
+
+
+def get_uprn_postcode_table(council_id):
+    """
+    Returns a UprnPostcodeTable of every address in council_id.
+
+    Only fetches the columns we need and streams
+    them from a server-side cursor.
+    """
+    rows = (
+        Address.objects.filter(uprntocouncil__lad=council_id)
+        .order_by()
+        .values_list("uprn", "postcode")
+        .iterator(chunk_size=10000)
+    )
+    return UprnPostcodeTable(rows)
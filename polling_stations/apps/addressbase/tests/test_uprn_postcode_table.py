@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from addressbase.models import (
+    Address,
+    UprnPostcodeTable,
+    UprnToCouncil,
+    get_uprn_postcode_table,
+)
+
+
+class UprnPostcodeTableTest(TestCase):
+    def test_lookup(self):
+        table = UprnPostcodeTable(
+            [
+                ("10", "AA1 1AA"),
+                ("2", "AA1 1AB"),
+                ("100000000000", "AA1 1AA"),
+                ("0003", "ZZ1 1ZZ"),
+            ]
+        )
+
+        self.assertEqual(4, len(table))
+        self.assertEqual("AA11AA", table["10"])
+        self.assertEqual("AA11AB", table["2"])
+        self.assertEqual("AA11AA", table["100000000000"])
+        self.assertEqual("ZZ11ZZ", table["0003"])
+        self.assertIsNone(table.get("3"))
+        self.assertIsNone(table.get("02"))
+        self.assertNotIn("1", table)
+        self.assertEqual({"2", "10", "100000000000", "0003"}, set(table))
+
+    def test_get_uprn_postcode_table(self):
+        for uprn, postcode, lad in [
+            ("1", "AA1 1AA", "X01000001"),
+            ("2", "AA1 1AB", "X01000001"),
+            ("3", "BB1 1BB", "X01000002"),
+        ]:
+            Address.objects.create(uprn=uprn, address="foo", postcode=postcode)
+            UprnToCouncil.objects.create(uprn_id=uprn, lad=lad)
+
+        table = get_uprn_postcode_table("X01000001")
+        self.assertEqual({"1": "AA11AA", "2": "AA11AB"}, dict(table))
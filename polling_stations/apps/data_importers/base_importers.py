@@ -6,26 +6,22 @@ import json
 import glob
 import logging
 import os
-import tempfile
-import urllib.request
 
 from django.apps import apps
 from django.contrib.gis import geos
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.contrib.gis.geos import Point, GEOSGeometry, GEOSException
+from django.db import transaction
 
 from addressbase.models import UprnToCouncil
 from councils.models import Council
 from data_importers.data_types import AddressList, DistrictSet, StationSet
-from data_importers.data_quality_report import (
-    DataQualityReportBuilder,
-    StationReport,
-    DistrictReport,
-    AddressReport,
-)
+from data_importers.data_quality_report import DataQualityReportBuilder
 from data_importers.contexthelpers import Dwellings
-from data_importers.filehelpers import FileHelperFactory
+from data_importers.filehelpers import FileHelperFactory, ShpPartitioner
+from data_importers.geo_utils import CouncilAreaIndex
+from data_importers.httpcache import DownloadCache
 from data_importers.loghelper import LogHelper
 from data_importers.s3wrapper import S3Wrapper
 from pollingstations.models import PollingDistrict, PollingStation
@@ -36,15 +32,32 @@ class CsvMixin:
     csv_encoding = "utf-8"
     csv_delimiter = ","
 
+    # Set this to True to read CSV rows lazily instead of loading
+    # the whole file into memory. Only safe if we just iterate over
+    # (and take the len() of) the data returned by get_data()
+    csv_stream = False
+
     def get_csv_options(self):
-        return {"csv_encoding": self.csv_encoding, "csv_delimiter": self.csv_delimiter}
+        return {
+            "csv_encoding": self.csv_encoding,
+            "csv_delimiter": self.csv_delimiter,
+            "csv_stream": self.csv_stream,
+        }
 
 
 class ShpMixin:
     shp_encoding = "utf-8"
 
+    # Set this to True to only read the attribute table (.dbf) of
+    # shapefiles. Features will have a .shape of None, so only use
+    # this if we don't need geometry from any of our input files
+    shp_records_only = False
+
     def get_shp_options(self):
-        return {"shp_encoding": self.shp_encoding}
+        return {
+            "shp_encoding": self.shp_encoding,
+            "shp_records_only": self.shp_records_only,
+        }
 
 
 class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
@@ -64,6 +77,7 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
     batch_size = None
     imports_districts = False
     use_postcode_centroids = False
+    diff = False
 
     def write_info(self, message):
         if self.verbosity > 0:
@@ -79,6 +93,21 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
             default=False,
         )
 
+        parser.add_argument(
+            "--diff",
+            help="<Optional> Only write records which have changed since the last import",
+            action="store_true",
+            required=False,
+            default=False,
+        )
+
+        parser.add_argument(
+            "--log-events",
+            help="<Optional> Directory to write log events to as <council_id>.jsonl",
+            required=False,
+            default=None,
+        )
+
         parser.add_argument(
             "-p",
             "--use-postcode-centroids",
@@ -120,6 +149,47 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
     def import_data(self):
         pass
 
+    @abc.abstractmethod
+    def write_data(self):
+        pass
+
+    def swap_data(self):
+        """
+        Delete the old data for this council and write the new data
+        in a single transaction. Until it commits, other connections
+        keep seeing the previous import, so lookups for this council
+        never see it half-imported while we parse the input files.
+
+        In diff mode we don't delete anything up-front: write_data()
+        only writes the records that have changed.
+
+        post_import() runs in the same transaction, so its fixes are
+        published together with the rest of the import.
+        """
+        with transaction.atomic():
+            if not self.diff:
+                self.teardown(self.council)
+            self.write_data()
+
+            # Optional step for post import tasks
+            try:
+                self.post_import()
+            except NotImplementedError:
+                pass
+
+    def save_set(self, name, records):
+        if not self.diff:
+            self.write_info("%s: %i written in %.2fs" % ((name,) + records.save()))
+            return
+        self.write_info(
+            "%s: %i created, %i updated, %i deleted"
+            % ((name,) + records.save_changes())
+        )
+
+    def write_uprn_diff(self, updated):
+        if self.diff:
+            self.write_info("UPRNs: %i polling station assignments changed" % updated)
+
     def post_import(self):
         raise NotImplementedError
 
@@ -128,17 +198,14 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
         report = DataQualityReportBuilder(
             self.council.pk, expecting_districts=self.imports_districts
         )
-        station_report = StationReport(self.council.pk)
-        district_report = DistrictReport(self.council.pk)
-        address_report = AddressReport(self.council.pk)
         report.build_report()
 
         # save a static copy in the DB that we can serve up on the website
         record = DataQuality.objects.get_or_create(council_id=self.council.pk)
         record[0].report = report.generate_string_report()
-        record[0].num_stations = station_report.get_stations_imported()
-        record[0].num_districts = district_report.get_districts_imported()
-        record[0].num_addresses = address_report.get_addresses_with_station_id()
+        record[0].num_stations = report.counts["stations_imported"]
+        record[0].num_districts = report.counts["districts_imported"]
+        record[0].num_addresses = report.counts["addresses_with_station_id"]
 
         record[0].save()
 
@@ -177,28 +244,34 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
         )
 
         self.verbosity = kwargs.get("verbosity")
-        self.logger = LogHelper(self.verbosity)
         self.validation_checks = not (kwargs.get("nochecks"))
         self.allow_station_point_from_postcode = kwargs.get("use_postcode_centroids")
+        self.diff = kwargs.get("diff", False)
+        if self.diff and type(self).post_import is not BaseImporter.post_import:
+            # post_import() writes straight to the DB, which the diff
+            # would then see as changes (or duplicate) on the next run
+            self.write_info("post_import() can't be diffed: importing in full")
+            self.diff = False
 
         if self.council_id is None:
             self.council_id = args[0]
 
-        self.council = self.get_council(self.council_id)
-        self.write_info("Importing data for %s..." % self.council.name)
+        events_path = None
+        if kwargs.get("log_events"):
+            events_path = os.path.join(
+                kwargs["log_events"], "%s.jsonl" % self.council_id
+            )
+        self.logger = LogHelper(self.verbosity, events_path)
 
-        # Delete old data for this council
-        self.teardown(self.council)
+        try:
+            self.council = self.get_council(self.council_id)
+            self.write_info("Importing data for %s..." % self.council.name)
 
-        self.base_folder_path = self.get_base_folder_path()
+            self.base_folder_path = self.get_base_folder_path()
 
-        self.import_data()
-
-        # Optional step for post import tasks
-        try:
-            self.post_import()
-        except NotImplementedError:
-            pass
+            self.import_data()
+        finally:
+            self.logger.close()
 
         # save and output data quality report
         if self.verbosity > 0:
@@ -208,6 +281,7 @@ class BaseImporter(BaseCommand, metaclass=abc.ABCMeta):
 class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
 
     stations = None
+    council_area_index = None
 
     @property
     @abc.abstractmethod
@@ -230,10 +304,38 @@ class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
     def get_station_hash(self, station):
         raise NotImplementedError
 
+    def get_council_area_index(self):
+        """
+        Any station for this council should be in the target council
+        or one of its neighbours, so we load those areas once and answer
+        check_station_point() in memory instead of with a query per station.
+        """
+        if self.council_area_index is None:
+            if self.council.area is None:
+                councils = []
+            else:
+                councils = Council.objects.filter(
+                    area__bboverlaps=self.council.area
+                ).only("council_id", "name", "identifiers", "area")
+            self.council_area_index = CouncilAreaIndex(councils)
+        return self.council_area_index
+
+    def get_council_covering_point(self, point):
+        councils = self.get_council_area_index().covering(point)
+        for council in councils:
+            if self.council_id in council.identifiers:
+                return council
+        if councils:
+            return councils[0]
+
+        # If the point isn't in one of the councils we've indexed,
+        # it's a long way from the target council: fall back to the DB
+        return Council.objects.get(area__covers=point)
+
     def check_station_point(self, station_record):
         if station_record["location"]:
             try:
-                council = Council.objects.get(area__covers=station_record["location"])
+                council = self.get_council_covering_point(station_record["location"])
                 if self.council_id not in council.identifiers:
                     self.logger.log_message(
                         logging.WARNING,
@@ -255,12 +357,12 @@ class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
 
     def import_polling_stations(self):
         stations = self.get_stations()
-        if not isinstance(self, BaseAddressesImporter):
-            self.write_info(
-                "Stations: Found %i features in input file" % (len(stations))
-            )
         seen = set()
+        # count the features as we go: taking the len() of a lazy
+        # sequence (e.g: GeoJsonFeatures) first means reading it twice
+        count = 0
         for station in stations:
+            count += 1
             """
             We can optionally define a function get_station_hash()
 
@@ -363,6 +465,9 @@ class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
                     self.check_station_point(station_record)
                 self.add_polling_station(station_record)
 
+        if not isinstance(self, BaseAddressesImporter):
+            self.write_info("Stations: Found %i features in input file" % count)
+
     def add_polling_station(self, station_info):
         self.stations.add(station_info)
 
@@ -372,6 +477,8 @@ class BaseDistrictsImporter(BaseImporter, metaclass=abc.ABCMeta):
 
     districts = None
     districts_srid = None
+    district_overlaps = None
+    council_area = None
 
     @property
     @abc.abstractmethod
@@ -406,8 +513,26 @@ class BaseDistrictsImporter(BaseImporter, metaclass=abc.ABCMeta):
     def district_record_to_dict(self, record):
         pass
 
+    def get_council_area(self):
+        """
+        Transform the council area to EPSG:27700 and prepare it once per import
+        so we don't re-project the whole council for every district we check
+        """
+        if self.council_area is None:
+            area = self.council.area.transform(27700, clone=True)
+            self.council_area = (area, area.prepared)
+        return self.council_area
+
     def check_district_overlap(self, district_record):
-        if self.council.area.contains(district_record["area"]):
+        if self.council.area is None:
+            return None
+
+        council_area, prepared_council_area = self.get_council_area()
+        district_area = district_record["area"]
+        if district_area.srid != 27700:
+            district_area = district_area.transform(27700, clone=True)
+
+        if prepared_council_area.contains(district_area):
             self.logger.log_message(
                 logging.INFO,
                 "District %s is fully contained by target local auth",
@@ -416,16 +541,12 @@ class BaseDistrictsImporter(BaseImporter, metaclass=abc.ABCMeta):
             return 100
 
         try:
-            intersection = self.council.area.intersection(
-                district_record["area"].transform(4326, clone=True)
-            )
-            district_area = district_record["area"].transform(27700, clone=True).area
-            intersection_area = intersection.transform(27700, clone=True).area
+            intersection_area = council_area.intersection(district_area).area
         except GEOSException as e:
             self.logger.log_message(logging.ERROR, str(e))
             return
 
-        overlap_percentage = (intersection_area / district_area) * 100
+        overlap_percentage = (intersection_area / district_area.area) * 100
         if overlap_percentage > 99:
             # meh - close enough
             level = logging.INFO
@@ -441,10 +562,28 @@ class BaseDistrictsImporter(BaseImporter, metaclass=abc.ABCMeta):
 
         return overlap_percentage
 
+    def report_district_overlaps(self):
+        """
+        Output a table of internal_council_id -> overlap % for every
+        district we checked against the target council area
+        """
+        if not self.district_overlaps:
+            return
+
+        lines = ["District overlap with target local auth:"]
+        for district_id, overlap in sorted(self.district_overlaps.items()):
+            if overlap is None:
+                lines.append("{0:<20} {1:>8}".format(district_id, "error"))
+            else:
+                lines.append("{0:<20} {1:>7.2f}%".format(district_id, overlap))
+        self.logger.log_message(logging.INFO, "\n".join(lines))
+
     def import_polling_districts(self):
         districts = self.get_districts()
-        self.write_info("Districts: Found %i features in input file" % (len(districts)))
+        self.district_overlaps = {}
+        count = 0
         for district in districts:
+            count += 1
             if self.districts_filetype in ["shp", "shp.zip"]:
                 district_info = self.district_record_to_dict(district.record)
             else:
@@ -473,21 +612,27 @@ class BaseDistrictsImporter(BaseImporter, metaclass=abc.ABCMeta):
             For other file types, we must return the key
             'area' from address_record_to_dict()
             """
-            if self.districts_filetype in ["shp", "shp.zip"]:
-                geojson = json.dumps(district.shape.__geo_interface__)
-            if self.districts_filetype == "geojson":
-                geojson = json.dumps(district["geometry"])
             if "area" not in district_info and (
                 self.districts_filetype in ["shp", "shp.zip", "geojson"]
             ):
+                if self.districts_filetype == "geojson":
+                    geojson = json.dumps(district["geometry"])
+                else:
+                    geojson = json.dumps(district.shape.__geo_interface__)
                 poly = self.clean_poly(GEOSGeometry(geojson))
                 poly.srid = self.get_srid("districts")
                 district_info["area"] = poly
 
             if self.validation_checks:
-                self.check_district_overlap(district_info)
+                self.district_overlaps[
+                    district_info["internal_council_id"]
+                ] = self.check_district_overlap(district_info)
             self.add_polling_district(district_info)
 
+        self.write_info("Districts: Found %i features in input file" % count)
+        if self.validation_checks:
+            self.report_district_overlaps()
+
     def add_polling_district(self, district_info):
         self.districts.add(district_info)
 
@@ -496,6 +641,22 @@ class BaseAddressesImporter(BaseImporter, metaclass=abc.ABCMeta):
 
     addresses = None
 
+    """
+    Corrections to the addresses we get from address_record_to_dict(),
+    declared on the import script instead of overriding it.
+    Leading zeros on UPRNs are ignored.
+
+    excluded_uprns: UPRNs of addresses we shouldn't import
+    excluded_postcodes: postcodes of addresses we shouldn't import
+    uprn_postcode_corrections: {UPRN: correct postcode}
+    station_id_remaps: {polling_station_id: polling_station_id to use instead}
+    """
+    excluded_uprns = []
+    excluded_postcodes = []
+    uprn_postcode_corrections = {}
+    station_id_remaps = {}
+    address_overrides = None
+
     @property
     @abc.abstractmethod
     def addresses_filetype(self):
@@ -520,16 +681,63 @@ class BaseAddressesImporter(BaseImporter, metaclass=abc.ABCMeta):
         self.write_info("Contextual Data:")
         self.write_info(
             "Total UPRNs in AddressBase: {:,}".format(
-                dwellings.from_addressbase(self.council.area)
+                dwellings.from_addressbase(self.council.council_id)
             )
         )
-        self.write_info(
-            "Total Dwellings from 2011 Census: {:,}".format(
-                dwellings.from_census(self.council_id)
+        census_dwellings = dwellings.from_census(self.council_id)
+        if census_dwellings is None:
+            self.write_info(
+                "Total Dwellings from 2011 Census: unknown "
+                "(run manage.py load_census_dwellings)"
+            )
+        else:
+            self.write_info(
+                "Total Dwellings from 2011 Census: {:,}".format(census_dwellings)
             )
-        )
         self.write_info("----------------------------------")
 
+    def get_address_overrides(self):
+        # build these once per import, not once per address
+        if self.address_overrides is None:
+            self.address_overrides = (
+                frozenset(str(uprn).lstrip("0") for uprn in self.excluded_uprns),
+                frozenset(postcode.strip() for postcode in self.excluded_postcodes),
+                {
+                    str(uprn).lstrip("0"): postcode
+                    for uprn, postcode in self.uprn_postcode_corrections.items()
+                },
+                self.station_id_remaps,
+            )
+        return self.address_overrides
+
+    def apply_address_overrides(self, address_info):
+        """
+        Apply excluded_uprns, excluded_postcodes, uprn_postcode_corrections
+        and station_id_remaps to the output of address_record_to_dict().
+        Returns None if the address should be excluded.
+        """
+        if address_info is None:
+            return None
+        (
+            excluded_uprns,
+            excluded_postcodes,
+            postcode_corrections,
+            station_id_remaps,
+        ) = self.get_address_overrides()
+
+        uprn = str(address_info.get("uprn", "")).lstrip("0")
+        if uprn in excluded_uprns:
+            return None
+        if address_info["postcode"].strip() in excluded_postcodes:
+            return None
+        if uprn in postcode_corrections:
+            address_info["postcode"] = postcode_corrections[uprn]
+
+        station_id = address_info.get("polling_station_id")
+        if station_id in station_id_remaps:
+            address_info["polling_station_id"] = station_id_remaps[station_id]
+        return address_info
+
     def import_residential_addresses(self):
         if self.validation_checks:
             self.write_context_data()
@@ -539,7 +747,9 @@ class BaseAddressesImporter(BaseImporter, metaclass=abc.ABCMeta):
         )
         self.write_info("----------------------------------")
         for address in addresses:
-            address_info = self.address_record_to_dict(address)
+            address_info = self.apply_address_overrides(
+                self.address_record_to_dict(address)
+            )
 
             if address_info is None:
                 self.logger.log_message(
@@ -648,9 +858,14 @@ class BaseStationsDistrictsImporter(BaseStationsImporter, BaseDistrictsImporter)
         self.districts = DistrictSet()
         self.import_polling_districts()
         self.import_polling_stations()
-        self.districts.save()
-        self.stations.save()
-        self.districts.update_uprn_to_council_model(self.districts_have_station_ids)
+        self.swap_data()
+
+    def write_data(self):
+        self.save_set("Districts", self.districts)
+        self.save_set("Stations", self.stations)
+        self.write_uprn_diff(
+            self.districts.update_uprn_to_council_model(self.districts_have_station_ids)
+        )
 
 
 class BaseStationsAddressesImporter(BaseStationsImporter, BaseAddressesImporter):
@@ -669,9 +884,24 @@ class BaseStationsAddressesImporter(BaseStationsImporter, BaseAddressesImporter)
         self.addresses = AddressList(self.logger)
         self.import_residential_addresses()
         self.import_polling_stations()
-        self.addresses.check_records()
-        self.addresses.update_uprn_to_council_model()
-        self.stations.save()
+        self.check_addresses()
+        self.swap_data()
+
+    def check_addresses(self):
+        rejected = self.addresses.check_records()
+        self.write_info(
+            "Addresses: {:,} records matched AddressBase".format(
+                len(self.addresses.elements)
+            )
+        )
+        for reason, count in sorted(rejected.items()):
+            self.write_info(
+                "Addresses: {:,} removed ({})".format(count, reason.replace("_", " "))
+            )
+
+    def write_data(self):
+        self.write_uprn_diff(self.addresses.update_uprn_to_council_model())
+        self.save_set("Stations", self.stations)
 
 
 class BaseCsvStationsShpDistrictsImporter(
@@ -769,6 +999,31 @@ class BaseScotlandSpatialHubImporter(
     def parse_string(self, text):
         return text.strip().strip("\x00")
 
+    def get_council_partition(self, name):
+        """
+        Every council's importer reads the same national files, so
+        split them by council name once and just read our partition
+        """
+        partitioner = ShpPartitioner(
+            os.path.join(self.base_folder_path, name),
+            os.path.join(os.path.dirname(self.base_folder_path), ".partitions"),
+            key=lambda record: self.parse_string(record[2]),
+            encoding=self.shp_encoding,
+        )
+        return partitioner.get_partition(self.council_name)
+
+    def get_districts(self):
+        districts_file = self.get_council_partition(self.districts_name)
+        if districts_file is None:
+            return []
+        return self.get_data(self.districts_filetype, districts_file)
+
+    def get_stations(self):
+        stations_file = self.get_council_partition(self.stations_name)
+        if stations_file is None:
+            return []
+        return self.get_data(self.stations_filetype, stations_file)
+
     def district_record_to_dict(self, record):
         council_name = self.parse_string(record[2])
         if council_name != self.council_name:
@@ -831,6 +1086,28 @@ class BaseGenericApiImporter(BaseStationsDistrictsImporter):
     stations_url = None
 
     local_files = False
+    offline = False
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--offline",
+            help="<Optional> Don't make any HTTP requests: use the responses cached by a previous run",
+            action="store_true",
+            required=False,
+            default=False,
+        )
+
+    def handle(self, *args, **kwargs):
+        self.offline = kwargs.get("offline", False)
+        super().handle(*args, **kwargs)
+
+    def download(self, url):
+        """
+        Return the path to a local copy of url, from the download cache
+        """
+        return DownloadCache(offline=self.offline).fetch(url)
 
     def import_data(self):
 
@@ -849,19 +1126,13 @@ class BaseGenericApiImporter(BaseStationsDistrictsImporter):
         if self.stations_url is not None:
             self.import_polling_stations()
 
-        self.districts.save()
-        self.stations.save()
-        self.districts.update_uprn_to_council_model(self.districts_have_station_ids)
+        self.swap_data()
 
     def get_districts(self):
-        with tempfile.NamedTemporaryFile() as tmp:
-            urllib.request.urlretrieve(self.districts_url, tmp.name)
-            return self.get_data(self.districts_filetype, tmp.name)
+        return self.get_data(self.districts_filetype, self.download(self.districts_url))
 
     def get_stations(self):
-        with tempfile.NamedTemporaryFile() as tmp:
-            urllib.request.urlretrieve(self.stations_url, tmp.name)
-            return self.get_data(self.stations_filetype, tmp.name)
+        return self.get_data(self.stations_filetype, self.download(self.stations_url))
 
 
 class BaseApiKmlStationsKmlDistrictsImporter(BaseGenericApiImporter):
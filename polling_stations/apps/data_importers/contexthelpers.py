@@ -1,5 +1,6 @@
 import requests
-from addressbase.models import Address
+from addressbase.models import get_council_uprn_count
+from data_importers.models import CensusDwellings
 
 
 def get_stat_from_nomis(dataset, measure, gss_code):
@@ -21,9 +22,23 @@ def get_stat_from_nomis(dataset, measure, gss_code):
     return data["obs"][0]["obs_value"]["value"]
 
 
+def get_dwellings_from_nomis(gss_code):
+    return get_stat_from_nomis("NM_618_1", "20100", gss_code)
+
+
 class Dwellings:
+    """
+    Reads the counts we've stored locally, so this works offline
+    and only costs an indexed lookup per count.
+    """
+
     def from_census(self, gss_code):
-        return get_stat_from_nomis("NM_618_1", "20100", gss_code)
+        # Returns None if we haven't loaded a count for gss_code
+        # see the load_census_dwellings management command
+        try:
+            return CensusDwellings.objects.get(gss_code=gss_code).dwellings
+        except CensusDwellings.DoesNotExist:
+            return None
 
-    def from_addressbase(self, polygon):
-        return Address.objects.filter(location__within=polygon).count()
+    def from_addressbase(self, council_id):
+        return get_council_uprn_count(council_id)
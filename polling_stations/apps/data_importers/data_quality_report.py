@@ -1,9 +1,6 @@
 import re
 
 from django.db import connection
-from django.db.models import Q
-from pollingstations.models import PollingStation, PollingDistrict
-from addressbase.models import UprnToCouncil
 
 
 class ANSI:
@@ -33,278 +30,160 @@ class ANSI:
         return re.sub("\033\\[[0-9;]+m", "", text)
 
 
-# data quality stats for polling stations
-class StationReport:
-    def __init__(self, council_id):
-        self.council_id = council_id
-        # fmt: off
-        self.counts = {
-            "0": 0,
-            "1": 0,
-            ">1": 0
-        }
-        # fmt: on
-        self.generate_counts()
-
-    def get_stations_imported(self):
-        return PollingStation.objects.filter(council_id=self.council_id).count()
-
-    def get_stations_with_district_id(self):
-        return (
-            PollingStation.objects.filter(
-                council_id=self.council_id, polling_district_id__isnull=False
-            )
-            .exclude(polling_district_id="")
-            .count()
-        )
-
-    def get_stations_without_district_id(self):
-        return PollingStation.objects.filter(
-            Q(polling_district_id__isnull=True) | Q(polling_district_id=""),
-            council_id=self.council_id,
-        ).count()
-
-    def get_stations_with_valid_district_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM pollingstations_pollingstation
-            WHERE polling_district_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingdistrict
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_district_id != ''
-            AND polling_district_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
-        )
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def get_stations_with_invalid_district_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM pollingstations_pollingstation
-            WHERE polling_district_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingdistrict
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_district_id != ''
-            AND polling_district_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
-        )
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def get_stations_with_point(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id, location__isnull=False
-        ).count()
-
-    def get_stations_without_point(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id, location__isnull=True
-        ).count()
-
-    def get_stations_with_address(self):
-        return (
-            PollingStation.objects.filter(
-                council_id=self.council_id, address__isnull=False
-            )
-            .exclude(address="")
-            .count()
-        )
-
-    def get_stations_without_address(self):
-        return PollingStation.objects.filter(
-            Q(address__isnull=True) | Q(address=""), council_id=self.council_id
-        ).count()
-
-    def generate_counts(self):
-        stations = PollingStation.objects.filter(council_id=self.council_id)
-        counts = []
-        for station in stations:
-            if station.location is not None:
-                counts.append(
-                    PollingDistrict.objects.filter(
-                        area__contains=station.location
-                    ).count()
-                )
-        for count in counts:
-            if count == 0:
-                self.counts["0"] = self.counts["0"] + 1
-            elif count == 1:
-                self.counts["1"] = self.counts["1"] + 1
-            else:
-                self.counts[">1"] = self.counts[">1"] + 1
-
-    def get_stations_in_zero_districts(self):
-        return self.counts["0"]
-
-    def get_stations_in_one_districts(self):
-        return self.counts["1"]
-
-    def get_stations_in_more_districts(self):
-        return self.counts[">1"]
-
-
-# data quality stats for polling districts
-class DistrictReport:
-    def __init__(self, council_id):
-        self.council_id = council_id
-        # fmt: off
-        self.counts = {
-            "0": 0,
-            "1": 0,
-            ">1": 0
-        }
-        # fmt: on
-        self.generate_counts()
-
-    def get_districts_imported(self):
-        return PollingDistrict.objects.filter(council_id=self.council_id).count()
-
-    def get_districts_with_station_id(self):
-        return (
-            PollingDistrict.objects.filter(
-                council_id=self.council_id, polling_station_id__isnull=False
-            )
-            .exclude(polling_station_id="")
-            .count()
-        )
-
-    def get_districts_without_station_id(self):
-        return PollingDistrict.objects.filter(
-            Q(polling_station_id__isnull=True) | Q(polling_station_id=""),
-            council_id=self.council_id,
-        ).count()
-
-    def get_districts_with_valid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM pollingstations_pollingdistrict
-            WHERE polling_station_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
-        )
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def get_districts_with_invalid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM pollingstations_pollingdistrict
-            WHERE polling_station_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
+# every count in the data quality report for a council
+class DataQualityReport:
+    """
+    Rather than a query per metric (and a spatial query per station and
+    district), we work out everything in one statement: each table for the
+    council is scanned once, aggregating with FILTER clauses, and the
+    station <-> district point in polygon join is done once and shared
+    between the station and district counts.
+    """
+
+    query = """
+        WITH stations AS (
+            SELECT id, internal_council_id, polling_district_id, address, location
+            FROM pollingstations_pollingstation
+            WHERE council_id = %(council_id)s
+        ), districts AS (
+            SELECT id, internal_council_id, polling_station_id, area
+            FROM pollingstations_pollingdistrict
+            WHERE council_id = %(council_id)s
+        ), station_districts AS (
+            SELECT s.id AS station_id, d.id AS district_id
+            FROM stations s
+            JOIN districts d ON ST_Contains(d.area, s.location)
+        ), station_counts AS (
+            SELECT
+                COUNT(*) AS stations_imported,
+                COUNT(*) FILTER (
+                    WHERE s.polling_district_id != ''
+                ) AS stations_with_district_id,
+                COUNT(*) FILTER (
+                    WHERE COALESCE(s.polling_district_id, '') = ''
+                ) AS stations_without_district_id,
+                COUNT(*) FILTER (
+                    WHERE s.polling_district_id != ''
+                    AND s.polling_district_id IN (
+                        SELECT internal_council_id FROM districts
+                    )
+                ) AS stations_with_valid_district_id_ref,
+                COUNT(*) FILTER (
+                    WHERE s.polling_district_id != ''
+                    AND s.polling_district_id NOT IN (
+                        SELECT internal_council_id FROM districts
+                    )
+                ) AS stations_with_invalid_district_id_ref,
+                COUNT(s.location) AS stations_with_point,
+                COUNT(*) FILTER (
+                    WHERE s.location IS NULL
+                ) AS stations_without_point,
+                COUNT(*) FILTER (
+                    WHERE s.address != ''
+                ) AS stations_with_address,
+                COUNT(*) FILTER (
+                    WHERE COALESCE(s.address, '') = ''
+                ) AS stations_without_address,
+                COUNT(*) FILTER (
+                    WHERE s.location IS NOT NULL AND COALESCE(sd.n, 0) = 0
+                ) AS stations_in_zero_districts,
+                COUNT(*) FILTER (
+                    WHERE sd.n = 1
+                ) AS stations_in_one_districts,
+                COUNT(*) FILTER (
+                    WHERE sd.n > 1
+                ) AS stations_in_more_districts
+            FROM stations s
+            LEFT JOIN (
+                SELECT station_id, COUNT(*) AS n
+                FROM station_districts
+                GROUP BY station_id
+            ) sd ON sd.station_id = s.id
+        ), district_counts AS (
+            SELECT
+                COUNT(*) AS districts_imported,
+                COUNT(*) FILTER (
+                    WHERE d.polling_station_id != ''
+                ) AS districts_with_station_id,
+                COUNT(*) FILTER (
+                    WHERE COALESCE(d.polling_station_id, '') = ''
+                ) AS districts_without_station_id,
+                COUNT(*) FILTER (
+                    WHERE d.polling_station_id != ''
+                    AND d.polling_station_id IN (
+                        SELECT internal_council_id FROM stations
+                    )
+                ) AS districts_with_valid_station_id_ref,
+                COUNT(*) FILTER (
+                    WHERE d.polling_station_id != ''
+                    AND d.polling_station_id NOT IN (
+                        SELECT internal_council_id FROM stations
+                    )
+                ) AS districts_with_invalid_station_id_ref,
+                COUNT(*) FILTER (
+                    WHERE d.area IS NOT NULL AND COALESCE(ds.n, 0) = 0
+                ) AS districts_containing_zero_stations,
+                COUNT(*) FILTER (
+                    WHERE ds.n = 1
+                ) AS districts_containing_one_stations,
+                COUNT(*) FILTER (
+                    WHERE ds.n > 1
+                ) AS districts_containing_more_stations
+            FROM districts d
+            LEFT JOIN (
+                SELECT district_id, COUNT(*) AS n
+                FROM station_districts
+                GROUP BY district_id
+            ) ds ON ds.district_id = d.id
+        ), address_counts AS (
+            SELECT
+                COUNT(*) AS uprns_in_addressbase,
+                COUNT(*) FILTER (
+                    WHERE u.polling_station_id != ''
+                ) AS addresses_with_station_id,
+                COUNT(*) FILTER (
+                    WHERE COALESCE(u.polling_station_id, '') = ''
+                ) AS addresses_without_station_id,
+                COUNT(*) FILTER (
+                    WHERE u.polling_station_id != ''
+                    AND u.polling_station_id IN (
+                        SELECT internal_council_id FROM stations
+                    )
+                ) AS addresses_with_valid_station_id_ref,
+                COUNT(*) FILTER (
+                    WHERE u.polling_station_id != ''
+                    AND u.polling_station_id NOT IN (
+                        SELECT internal_council_id FROM stations
+                    )
+                ) AS addresses_with_invalid_station_id_ref
+            FROM addressbase_uprntocouncil u
+            WHERE u.lad = %(council_id)s
         )
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def generate_counts(self):
-        districts = PollingDistrict.objects.filter(council_id=self.council_id)
-        counts = []
-        for district in districts:
-            if district.area is not None:
-                counts.append(
-                    PollingStation.objects.filter(
-                        location__within=district.area
-                    ).count()
-                )
-        for count in counts:
-            if count == 0:
-                self.counts["0"] = self.counts["0"] + 1
-            elif count == 1:
-                self.counts["1"] = self.counts["1"] + 1
-            else:
-                self.counts[">1"] = self.counts[">1"] + 1
-
-    def get_districts_containing_zero_stations(self):
-        return self.counts["0"]
-
-    def get_districts_containing_one_stations(self):
-        return self.counts["1"]
-
-    def get_districts_containing_more_stations(self):
-        return self.counts[">1"]
-
+        SELECT * FROM station_counts, district_counts, address_counts;
+    """
 
-# data quality stats for UPRNs assigned polling station ids
-class AddressReport:
     def __init__(self, council_id):
         self.council_id = council_id
+        self.counts = self.get_counts()
 
-    def get_uprns_in_addressbase(self):
-        return UprnToCouncil.objects.filter(lad=self.council_id).count()
+    def get_counts(self):
+        """
+        Returns a dict of metric name -> count
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(self.query, {"council_id": self.council_id})
+            columns = [col[0] for col in cursor.description]
+            return dict(zip(columns, cursor.fetchone()))
 
-    def get_addresses_with_station_id(self):
-        return (
-            UprnToCouncil.objects.filter(
-                lad=self.council_id, polling_station_id__isnull=False
-            )
-            .exclude(polling_station_id="")
-            .count()
-        )
-
-    def get_addresses_without_station_id(self):
-        return UprnToCouncil.objects.filter(
-            Q(polling_station_id__isnull=True) | Q(polling_station_id=""),
-            council_id=self.council_id,
-        ).count()
-
-    def get_addresses_with_valid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM addressbase_uprntocouncil
-            WHERE polling_station_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND lad=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
-        )
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def get_addresses_with_invalid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM addressbase_uprntocouncil
-            WHERE polling_station_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND lad=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-            """,
-            [self.council_id, self.council_id],
-        )
-        results = cursor.fetchall()
-        return results[0][0]
+    def __getitem__(self, key):
+        return self.counts[key]
 
 
 # generate all the stats
 class DataQualityReportBuilder:
-    def __init__(self, council_id, expecting_districts):
+    def __init__(self, council_id, expecting_districts=True):
         self.council_id = council_id
+        self.counts = DataQualityReport(council_id)
         self.report = []
         # Whether the importer is expected to have imported districts;
         # controls whether relevant summaries appear in the report.
@@ -316,9 +195,9 @@ class DataQualityReportBuilder:
         self.report.append("==================================\n")
 
     def build_station_report(self):
-        stations_report = StationReport(self.council_id)
+        counts = self.counts
 
-        stations_imported = stations_report.get_stations_imported()
+        stations_imported = counts["stations_imported"]
         if stations_imported > 0:
             self.report.append(
                 ANSI.bold("STATIONS IMPORTED                : %i" % (stations_imported))
@@ -326,7 +205,7 @@ class DataQualityReportBuilder:
             self.report.append("----------------------------------")
 
             if self.expecting_districts:
-                district_ids = stations_report.get_stations_with_district_id()
+                district_ids = counts["stations_with_district_id"]
                 if district_ids > 0:
                     self.report.append(
                         ANSI.ok_bold(
@@ -336,17 +215,13 @@ class DataQualityReportBuilder:
                     self.report.append(
                         ANSI.ok(
                             "   - valid district id refs      : %i"
-                            % (
-                                stations_report.get_stations_with_valid_district_id_ref()
-                            ),
+                            % (counts["stations_with_valid_district_id_ref"]),
                         )
                     )
                     self.report.append(
                         ANSI.warning(
                             "   - invalid district id refs    : %i"
-                            % (
-                                stations_report.get_stations_with_invalid_district_id_ref()
-                            )
+                            % (counts["stations_with_invalid_district_id_ref"])
                         )
                     )
                 else:
@@ -359,31 +234,31 @@ class DataQualityReportBuilder:
                 self.report.append(
                     ANSI.warning(
                         " - without district id           : %i"
-                        % (stations_report.get_stations_without_district_id())
+                        % (counts["stations_without_district_id"])
                     )
                 )
             self.report.append(
                 ANSI.ok(
                     " - with point                    : %i"
-                    % (stations_report.get_stations_with_point())
+                    % (counts["stations_with_point"])
                 )
             )
             self.report.append(
                 ANSI.warning(
                     " - without point                 : %i"
-                    % (stations_report.get_stations_without_point()),
+                    % (counts["stations_without_point"]),
                 )
             )
             self.report.append(
                 ANSI.ok(
                     " - with address                  : %i"
-                    % (stations_report.get_stations_with_address()),
+                    % (counts["stations_with_address"]),
                 )
             )
             self.report.append(
                 ANSI.warning(
                     " - without address               : %i"
-                    % (stations_report.get_stations_without_address())
+                    % (counts["stations_without_address"])
                 )
             )
             if self.expecting_districts:
@@ -392,27 +267,27 @@ class DataQualityReportBuilder:
                 self.report.append(
                     ANSI.warning(
                         "Stations in 0 districts          : %i"
-                        % (stations_report.get_stations_in_zero_districts())
+                        % (counts["stations_in_zero_districts"])
                     )
                 )
                 self.report.append(
                     ANSI.ok(
                         "Stations in 1 districts          : %i"
-                        % (stations_report.get_stations_in_one_districts())
+                        % (counts["stations_in_one_districts"])
                     )
                 )
                 self.report.append(
                     ANSI.warning(
                         "Stations in >1 districts         : %i"
-                        % (stations_report.get_stations_in_more_districts()),
+                        % (counts["stations_in_more_districts"]),
                     )
                 )
             self.report.append("\n")
 
     def build_district_report(self):
-        districts_report = DistrictReport(self.council_id)
+        counts = self.counts
 
-        districts_imported = districts_report.get_districts_imported()
+        districts_imported = counts["districts_imported"]
         if self.expecting_districts:
             self.report.append(
                 ANSI.bold(
@@ -421,7 +296,7 @@ class DataQualityReportBuilder:
             )
             self.report.append("----------------------------------")
 
-            station_ids = districts_report.get_districts_with_station_id()
+            station_ids = counts["districts_with_station_id"]
             if station_ids > 0:
                 self.report.append(
                     ANSI.ok_bold(
@@ -431,13 +306,13 @@ class DataQualityReportBuilder:
                 self.report.append(
                     ANSI.ok(
                         "   - valid station id refs       : %i"
-                        % (districts_report.get_districts_with_valid_station_id_ref()),
+                        % (counts["districts_with_valid_station_id_ref"]),
                     )
                 )
                 self.report.append(
                     ANSI.warning(
                         "   - invalid station id refs     : %i"
-                        % (districts_report.get_districts_with_invalid_station_id_ref())
+                        % (counts["districts_with_invalid_station_id_ref"])
                     )
                 )
             else:
@@ -450,7 +325,7 @@ class DataQualityReportBuilder:
             self.report.append(
                 ANSI.warning(
                     " - without station id            : %i"
-                    % (districts_report.get_districts_without_station_id()),
+                    % (counts["districts_without_station_id"]),
                 )
             )
             self.report.append("----------------------------------")
@@ -458,29 +333,28 @@ class DataQualityReportBuilder:
             self.report.append(
                 ANSI.warning(
                     "Districts containing 0 stations  : %i"
-                    % (districts_report.get_districts_containing_zero_stations())
+                    % (counts["districts_containing_zero_stations"])
                 )
             )
             self.report.append(
                 ANSI.ok(
                     "Districts containing 1 stations  : %i"
-                    % (districts_report.get_districts_containing_one_stations())
+                    % (counts["districts_containing_one_stations"])
                 )
             )
             self.report.append(
                 ANSI.warning(
                     "Districts containing >1 stations : %i"
-                    % (districts_report.get_districts_containing_more_stations()),
+                    % (counts["districts_containing_more_stations"]),
                 )
             )
             self.report.append("\n")
 
     def build_address_report(self):
-        address_report = AddressReport(self.council_id)
-        uprns_in_council_area = address_report.get_uprns_in_addressbase()
-        addresses_imported = address_report.get_addresses_with_station_id()
-        station_ids = address_report.get_addresses_with_station_id()
-        if addresses_imported > 0:
+        counts = self.counts
+        uprns_in_council_area = counts["uprns_in_addressbase"]
+        station_ids = counts["addresses_with_station_id"]
+        if station_ids > 0:
             self.report.append(
                 ANSI.bold(f"UPRNS ASSIGNED STATION ID        : {station_ids}")
             )
@@ -495,13 +369,13 @@ class DataQualityReportBuilder:
             self.report.append(
                 ANSI.ok(
                     "   - valid station id refs       : %i"
-                    % (address_report.get_addresses_with_valid_station_id_ref()),
+                    % (counts["addresses_with_valid_station_id_ref"]),
                 )
             )
             self.report.append(
                 ANSI.warning(
                     "   - invalid station id refs     : %i"
-                    % (address_report.get_addresses_with_invalid_station_id_ref()),
+                    % (counts["addresses_with_invalid_station_id_ref"]),
                 )
             )
         else:
@@ -3,19 +3,25 @@ Data type classes used by base importers
 """
 
 import abc
+import csv
+import io
 import logging
-from collections import namedtuple
+import sys
+import time
+from collections import Counter, namedtuple
+from collections.abc import Mapping
 
-from django.db import connection
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection, transaction
 
-from addressbase.models import get_uprn_hash_table, UprnToCouncil
+from addressbase.models import get_uprn_postcode_table, UprnToCouncil
 from pollingstations.models import PollingDistrict, PollingStation
 from uk_geo_utils.helpers import Postcode
 
 Station = namedtuple(
     "Station",
     [
-        "council",
+        "council_id",
         "internal_council_id",
         "postcode",
         "address",
@@ -29,7 +35,7 @@ District = namedtuple(
     "District",
     [
         "name",
-        "council",
+        "council_id",
         "internal_council_id",
         "extra_id",
         "area",
@@ -38,13 +44,65 @@ District = namedtuple(
 )
 
 
+def intern_string(value):
+    """
+    Importers see the same station IDs and postcodes over and over:
+    share one copy of each string between all the records that use it.
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+def get_council_id(council):
+    # elements are usually given a Council, but we only keep the id
+    return intern_string(getattr(council, "council_id", council))
+
+
+def copy_text_value(value):
+    """
+    Format a value for COPY ... FROM STDIN in PostgreSQL's text format
+    """
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
 class RecordsNotSavedException(Exception):
     """Records weren't saved to the db"""
 
     pass
 
 
+def geometries_equal(existing, ewkb):
+    """
+    Compare a geometry we loaded from the DB with one we've stored as ewkb
+    """
+    if existing is None or ewkb is None:
+        return existing is None and ewkb is None
+    # GEOSGeometry() reads a memoryview as WKB (but bytes as text)
+    geom = GEOSGeometry(memoryview(ewkb))
+    if geom.srid and existing.srid and geom.srid != existing.srid:
+        geom.transform(existing.srid)
+    return existing.equals_exact(geom, tolerance=1e-9)
+
+
 class CustomSet(metaclass=abc.ABCMeta):
+    # The model we save elements as, and the fields
+    # we compare to decide if a saved record has changed
+    model = None
+    compare_fields = []
+    geometry_field = None
+    # The element attributes we write with COPY, named
+    # the same as the model fields they're stored in
+    copy_fields = []
+
     def __init__(self):
         self.elements = set()
         self.saved = False
@@ -53,15 +111,126 @@ class CustomSet(metaclass=abc.ABCMeta):
         self.elements.add(self.build_namedtuple(element))
         self.saved = False
 
+    @property
+    def council_id(self):  # TODO Deal with old_to_new council_ids map
+        for e in self.elements:
+            if isinstance(e, dict):
+                return e["council"].council_id
+            else:
+                return e.council_id
+
     @abc.abstractmethod
     def build_namedtuple(self, element):
         pass
 
+    @abc.abstractmethod
+    def build_record(self, element):
+        pass
+
+    def get_copy_value(self, element, field):
+        value = getattr(element, field)
+        if field != self.geometry_field or value is None:
+            return value
+
+        geom = GEOSGeometry(memoryview(value))
+        srid = self.model._meta.get_field(field).srid
+        if not geom.srid:
+            geom.srid = srid
+        elif geom.srid != srid:
+            geom.transform(srid)
+        return geom.hexewkb.decode()
+
+    def write_copy_rows(self, buffer):
+        count = 0
+        for element in self.elements:
+            row = [self.get_copy_value(element, f) for f in self.copy_fields]
+            buffer.write("\t".join(copy_text_value(v) for v in row))
+            buffer.write("\n")
+            count += 1
+        return count
+
+    def save(self):
+        """
+        Stream the elements into the model's table with COPY,
+        which is much cheaper than building and INSERTing model instances.
+
+        Returns a tuple of (rows written, seconds taken)
+        """
+        start = time.perf_counter()
+        buffer = io.StringIO()
+        count = self.write_copy_rows(buffer)
+        buffer.seek(0)
+
+        columns = [self.model._meta.get_field(f).column for f in self.copy_fields]
+        # copy_expert() isn't one of the cursor methods Django wraps,
+        # so convert psycopg2 errors (e.g: IntegrityError) ourselves
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.copy_expert(
+                "COPY {0} ({1}) FROM STDIN;".format(
+                    self.model._meta.db_table, ", ".join(columns)
+                ),
+                buffer,
+            )
+        self.saved = True
+        return count, time.perf_counter() - start
+
+    def record_changed(self, existing, element):
+        """
+        Compare a record we loaded from the DB with one of our elements.
+        We compare geometries with the element's ewkb, rather than the
+        record we'd build from it, because a model instance's geometry
+        field always gives us a GEOSGeometry.
+        """
+        for field in self.compare_fields:
+            if field == self.geometry_field:
+                if not geometries_equal(
+                    getattr(existing, field), getattr(element, field)
+                ):
+                    return True
+            elif getattr(existing, field) != getattr(element, field):
+                return True
+        return False
+
+    def save_changes(self):
+        """
+        Only write the records which differ from the ones we've already
+        got in the DB for this council.
+        Returns a tuple of (created, updated, deleted) counts
+        """
+        existing = {
+            record.internal_council_id: record
+            for record in self.model.objects.filter(council_id=self.council_id)
+        }
+        seen = set()
+        to_create = []
+        to_update = []
+        for element in self.elements:
+            record = self.build_record(element)
+            seen.add(record.internal_council_id)
+            if record.internal_council_id not in existing:
+                to_create.append(record)
+                continue
+            saved_record = existing[record.internal_council_id]
+            if self.record_changed(saved_record, element):
+                record.pk = saved_record.pk
+                to_update.append(record)
+        to_delete = [record.pk for key, record in existing.items() if key not in seen]
+
+        self.model.objects.filter(pk__in=to_delete).delete()
+        self.model.objects.bulk_create(to_create)
+        self.model.objects.bulk_update(to_update, self.compare_fields)
+        self.saved = True
+        return len(to_create), len(to_update), len(to_delete)
+
 
 class AssignPollingStationsMixin(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
     def get_polling_station_lookup(self):
-        pass
+        """
+        Return a lookup of polling_station_id -> set of uprns for
+        update_uprn_to_council_model(). Classes which override that
+        don't need to implement this.
+        """
+        raise NotImplementedError
 
     @property
     def council_id(self):  # TODO Deal with old_to_new council_ids map
@@ -69,20 +238,98 @@ class AssignPollingStationsMixin(metaclass=abc.ABCMeta):
             if isinstance(e, dict):
                 return e["council"].council_id
             else:
-                return e.council.council_id
+                return e.council_id
+
+    def create_polling_station_lookup_table(self, cursor):
+        cursor.execute("DROP TABLE IF EXISTS uprn_polling_station_lookup;")
+        cursor.execute(
+            """
+            CREATE TEMP TABLE uprn_polling_station_lookup (
+                uprn TEXT NOT NULL,
+                polling_station_id TEXT NOT NULL
+            ) ON COMMIT DROP;
+            """
+        )
+
+    def write_polling_station_lookup(self, cursor, polling_station_lookup):
+        """
+        Stream polling_station_id -> set of uprns into a temp table with COPY
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for polling_station_id, uprns in polling_station_lookup.items():
+            for uprn in uprns:
+                writer.writerow([uprn, polling_station_id])
+        buffer.seek(0)
+        cursor.copy_expert(
+            """
+            COPY uprn_polling_station_lookup (uprn, polling_station_id)
+            FROM STDIN WITH (FORMAT csv);
+            """,
+            buffer,
+        )
+
+    def apply_polling_station_lookup(self, cursor):
+        """
+        Set polling_station_id for every UPRN in this council from the
+        lookup table: UPRNs which aren't in the lookup get ''.
+        If a UPRN is assigned to more than one polling station (e.g: because
+        it falls in an area where two districts overlap) we can't tell which
+        one is right, so that gets '' too.
+
+        We only write rows where polling_station_id actually changes,
+        so the number of rows updated is the size of the diff.
+        """
+        cursor.execute(
+            """
+            UPDATE {0} u
+            SET polling_station_id = n.polling_station_id
+            FROM (
+                SELECT c.uprn, COALESCE(l.polling_station_id, '') AS polling_station_id
+                FROM {0} c
+                LEFT JOIN (
+                    SELECT
+                        uprn,
+                        CASE WHEN COUNT(DISTINCT polling_station_id) > 1
+                            THEN ''
+                            ELSE MIN(polling_station_id)
+                        END AS polling_station_id
+                    FROM uprn_polling_station_lookup
+                    GROUP BY uprn
+                ) l
+                ON c.uprn = l.uprn
+                WHERE c.lad = %s
+            ) n
+            WHERE u.uprn = n.uprn
+            AND u.polling_station_id IS DISTINCT FROM n.polling_station_id;
+            """.format(
+                UprnToCouncil._meta.db_table
+            ),
+            [self.council_id],
+        )
+        updated = cursor.rowcount
+        cursor.execute("DROP TABLE uprn_polling_station_lookup;")
+        return updated
+
+    def assign_polling_stations(self, polling_station_lookup):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.create_polling_station_lookup_table(cursor)
+            self.write_polling_station_lookup(cursor, polling_station_lookup)
+            return self.apply_polling_station_lookup(cursor)
 
     def update_uprn_to_council_model(self, polling_station_lookup=None):
         if not polling_station_lookup:
             polling_station_lookup = self.get_polling_station_lookup()
 
-        uprns_in_council = UprnToCouncil.objects.filter(lad=self.council_id)
-        for polling_station_id, uprns in polling_station_lookup.items():
-            uprns_in_council.filter(uprn__in=uprns).update(
-                polling_station_id=polling_station_id
-            )
+        return self.assign_polling_stations(polling_station_lookup)
 
 
 class DistrictSet(CustomSet, AssignPollingStationsMixin):
+    model = PollingDistrict
+    compare_fields = ["name", "extra_id", "area", "polling_station_id"]
+    geometry_field = "area"
+    copy_fields = list(District._fields)
+
     def build_namedtuple(self, element):
 
         # MultiPolygon is mutable, so we must serialize it to store in a tuple
@@ -90,114 +337,117 @@ class DistrictSet(CustomSet, AssignPollingStationsMixin):
 
         return District(
             element.get("name", ""),
-            element["council"],
-            element["internal_council_id"],
+            get_council_id(element["council"]),
+            intern_string(element["internal_council_id"]),
             element.get("extra_id", ""),
             area,
-            element.get("polling_station_id", ""),
+            intern_string(element.get("polling_station_id", "")),
         )
 
-    def save(self):
-        districts_db = []
-        for district in self.elements:
-            record = PollingDistrict(
-                name=district.name,
-                council=district.council,
-                internal_council_id=district.internal_council_id,
-                extra_id=district.extra_id,
-                area=district.area,
-                polling_station_id=district.polling_station_id,
-            )
-            districts_db.append(record)
-        PollingDistrict.objects.bulk_create(districts_db)
-        self.saved = True
-
-    def get_uprns_by_district(self):
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-                SELECT a.uprn, d.polling_station_id
-                FROM addressbase_address a
-                    JOIN addressbase_uprntocouncil u
-                    ON a.uprn = u.uprn
-                    JOIN pollingstations_pollingdistrict d
-                    ON ST_Contains(d.area, a.location)
-                WHERE d.council_id=%s
-                AND u.lad=%s
-            """,
-            [self.council_id, self.council_id],
+    def build_record(self, district):
+        return PollingDistrict(
+            name=district.name,
+            council_id=district.council_id,
+            internal_council_id=district.internal_council_id,
+            extra_id=district.extra_id,
+            area=district.area,
+            polling_station_id=district.polling_station_id,
         )
-        return cursor.fetchall()
 
-    def get_uprns_by_district_join_stations(self):
-        cursor = connection.cursor()
+    def create_subdivided_districts_table(self, cursor):
+        # See http://blog.cleverelephant.ca/2019/11/subdivide.html for why we're doing this.
+        # tl;dr point in polygon lookups are super fast on small geometries.
+        cursor.execute("DROP TABLE IF EXISTS pollingdistrict_subdivided;")
         cursor.execute(
             """
-                SELECT a.uprn, s.internal_council_id
-                FROM addressbase_address a
-                    JOIN addressbase_uprntocouncil u
-                    ON a.uprn = u.uprn
-                    JOIN pollingstations_pollingdistrict d
-                    ON ST_Contains(d.area, a.location)
-                    JOIN pollingstations_pollingstation s
-                    ON s.polling_district_id = d.internal_council_id
-                WHERE d.council_id=%s
-                AND u.lad=%s
-                AND s.council_id=%s
-            """,
-            [self.council_id, self.council_id, self.council_id],
+            CREATE TEMP TABLE pollingdistrict_subdivided ON COMMIT DROP AS
+            SELECT id, internal_council_id, polling_station_id,
+                ST_Subdivide(area) AS geom
+            FROM {0}
+            WHERE council_id=%s;
+            """.format(
+                PollingDistrict._meta.db_table
+            ),
+            [self.council_id],
         )
-        return cursor.fetchall()
+        cursor.execute("CREATE INDEX ON pollingdistrict_subdivided USING GIST (geom);")
+        cursor.execute("ANALYZE pollingdistrict_subdivided;")
 
-    def get_polling_station_lookup(self, districts_have_station_ids=True):
-        """
-        for each address, build a lookup of polling_station_id -> set of uprns
+    def write_polling_station_lookup_from_districts(
+        self, cursor, districts_have_station_ids=True
+    ):
         """
-        if not self.saved:
-            raise RecordsNotSavedException(
-                "You must have called self.save() before self.get_polling_station_lookup()"
-            )
-
-        polling_station_lookup = {}
+        Spatial join between addresses and districts, done entirely in the DB.
 
+        A point which lies on an edge created by ST_Subdivide is not contained
+        by either of the subdivided pieces, so for points on the boundary of a
+        piece we fall back to checking the original district polygon. Either
+        way we use ST_Contains, so a UPRN on a district's boundary isn't in it.
+        """
         if districts_have_station_ids:
-            uprns = self.get_uprns_by_district()
+            station_select = "d.polling_station_id"
+            station_join = ""
+            params = []
         else:
-            uprns = self.get_uprns_by_district_join_stations()
-
-        for row in uprns:
-            uprn = row[0]
-            polling_station_id = row[1]
-            if polling_station_id not in polling_station_lookup:
-                polling_station_lookup[polling_station_id] = {uprn}
-            else:
-                polling_station_lookup[polling_station_id].add(uprn)
+            station_select = "s.internal_council_id"
+            station_join = """
+                JOIN pollingstations_pollingstation s
+                ON s.polling_district_id = d.internal_council_id
+                AND s.council_id = %s
+            """
+            params = [self.council_id]
 
-        return polling_station_lookup
+        cursor.execute(
+            """
+            INSERT INTO uprn_polling_station_lookup (uprn, polling_station_id)
+            SELECT DISTINCT a.uprn, {0}
+            FROM addressbase_address a
+                JOIN addressbase_uprntocouncil u
+                ON a.uprn = u.uprn
+                JOIN pollingdistrict_subdivided d
+                ON ST_Intersects(d.geom, a.location)
+                JOIN pollingstations_pollingdistrict pd
+                ON pd.id = d.id
+                {1}
+            WHERE u.lad=%s
+            AND (
+                ST_Contains(d.geom, a.location)
+                OR ST_Contains(pd.area, a.location)
+            );
+            """.format(
+                station_select, station_join
+            ),
+            params + [self.council_id],
+        )
 
     def update_uprn_to_council_model(
         self, districts_have_station_ids=True, polling_station_lookup=None
     ):
-        if not polling_station_lookup:
-            polling_station_lookup = self.get_polling_station_lookup(
-                districts_have_station_ids
-            )
+        if polling_station_lookup:
+            return self.assign_polling_stations(polling_station_lookup)
 
-        uprns_in_council = UprnToCouncil.objects.filter(lad=self.council_id)
-        seen = set()
-        for polling_station_id, uprns in polling_station_lookup.items():
-            uprns_in_council.filter(uprn__in=uprns).update(
-                polling_station_id=polling_station_id
+        if not self.saved:
+            raise RecordsNotSavedException(
+                "You must have called self.save() before self.update_uprn_to_council_model()"
             )
 
-            # We have to do this in case there are two districts which overlap
-            # and an address falls within that overlapping area.
-            duplicates = [u for u in uprns if u in seen]
-            uprns_in_council.filter(uprn__in=duplicates).update(polling_station_id="")
-            seen.update(uprns)
+        # Build the lookup server-side so no UPRN data crosses the wire
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.create_subdivided_districts_table(cursor)
+            self.create_polling_station_lookup_table(cursor)
+            self.write_polling_station_lookup_from_districts(
+                cursor, districts_have_station_ids
+            )
+            cursor.execute("DROP TABLE pollingdistrict_subdivided;")
+            return self.apply_polling_station_lookup(cursor)
 
 
 class StationSet(CustomSet):
+    model = PollingStation
+    compare_fields = ["postcode", "address", "location", "polling_district_id"]
+    geometry_field = "location"
+    copy_fields = list(Station._fields)
+
     def build_namedtuple(self, element):
 
         # Point is mutable, so we must serialize it to store in a tuple
@@ -207,36 +457,96 @@ class StationSet(CustomSet):
             location = None
 
         return Station(
-            element["council"],
-            element["internal_council_id"],
-            element.get("postcode", ""),
+            get_council_id(element["council"]),
+            intern_string(element["internal_council_id"]),
+            intern_string(element.get("postcode", "")),
             element.get("address", ""),
             location,
-            element.get("polling_district_id", ""),
+            intern_string(element.get("polling_district_id", "")),
         )
 
-    @property
-    def council_id(self):  # TODO Deal with old_to_new council_ids map
-        for e in self.elements:
-            if isinstance(e, dict):
-                return e["council"].council_id
-            else:
-                return e.council.council_id
+    def build_record(self, station):
+        return PollingStation(
+            council_id=station.council_id,
+            internal_council_id=station.internal_council_id,
+            postcode=station.postcode,
+            address=station.address,
+            location=station.location,
+            polling_district_id=station.polling_district_id,
+        )
 
-    def save(self):
-        stations_db = []
-        for station in self.elements:
-            record = PollingStation(
-                council=station.council,
-                internal_council_id=station.internal_council_id,
-                postcode=station.postcode,
-                address=station.address,
-                location=station.location,
-                polling_district_id=station.polling_district_id,
-            )
-            stations_db.append(record)
-        PollingStation.objects.bulk_create(stations_db)
-        self.saved = True
+
+class PostcodeNormaliser:
+    """
+    Memoised Postcode(...).without_space
+
+    Address lists repeat the same few thousand postcodes many times over
+    so we only need to parse each distinct string once.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def normalise(self, postcode):
+        try:
+            return self.cache[postcode]
+        except KeyError:
+            normalised = Postcode(postcode).without_space
+            self.cache[postcode] = normalised
+            return normalised
+
+
+class AddressRecord(Mapping):
+    """
+    A residential address in an AddressList
+
+    Large councils have hundreds of thousands of these, so rather than
+    keep each one as a dict (and a reference to the Council) we use a
+    slotted object holding the council id, with the postcode and station
+    id strings shared between records. It still behaves like the dict it
+    was built from, so record["uprn"] etc work as before.
+    """
+
+    __slots__ = ("address", "postcode", "uprn", "council_id", "polling_station_id")
+    keys_to_slots = {
+        "address": "address",
+        "postcode": "postcode",
+        "uprn": "uprn",
+        "council": "council_id",
+        "polling_station_id": "polling_station_id",
+    }
+
+    def __init__(self, address, postcode, uprn, council_id, polling_station_id):
+        self.address = address
+        self.postcode = intern_string(postcode)
+        self.uprn = uprn
+        self.council_id = intern_string(council_id)
+        self.polling_station_id = intern_string(polling_station_id)
+
+    @classmethod
+    def from_dict(cls, address):
+        return cls(
+            address["address"],
+            address["postcode"],
+            address["uprn"],
+            get_council_id(address["council"]),
+            address["polling_station_id"],
+        )
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self.keys_to_slots[key])
+        except KeyError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys_to_slots)
+
+    def __len__(self):
+        return len(self.keys_to_slots)
+
+    def __repr__(self):
+        return "AddressRecord(%r)" % dict(self)
 
 
 class AddressList(AssignPollingStationsMixin):
@@ -261,19 +571,19 @@ class AddressList(AssignPollingStationsMixin):
             )
             return
 
-        self.elements.append(address)
+        self.elements.append(AddressRecord.from_dict(address))
 
     def get_uprn_lookup(self):
         # for each address, build a lookup of uprn -> set of station ids
         uprn_lookup = {}
         for record in self.elements:
-            uprn = record["uprn"]
+            uprn = record.uprn
             if not uprn:
                 continue
             if uprn in uprn_lookup:
-                uprn_lookup[uprn].add(record["polling_station_id"])
+                uprn_lookup[uprn].add(record.polling_station_id)
             else:
-                uprn_lookup[uprn] = {record["polling_station_id"]}
+                uprn_lookup[uprn] = {record.polling_station_id}
 
         return uprn_lookup
 
@@ -281,39 +591,67 @@ class AddressList(AssignPollingStationsMixin):
     def remove_duplicate_uprns(self):
         uprn_lookup = self.get_uprn_lookup()
         self.elements = [
-            record for record in self.elements if len(uprn_lookup[record["uprn"]]) == 1
+            record for record in self.elements if len(uprn_lookup[record.uprn]) == 1
         ]
 
     def get_polling_station_lookup(self):
         # for each address, build a lookup of polling_station_id -> set of uprns
         polling_station_lookup = {}
         for record in self.elements:
-            if record["polling_station_id"] in polling_station_lookup:
-                polling_station_lookup[record["polling_station_id"]].add(record["uprn"])
+            if record.polling_station_id in polling_station_lookup:
+                polling_station_lookup[record.polling_station_id].add(record.uprn)
             else:
-                polling_station_lookup[record["polling_station_id"]] = set(
-                    record["uprn"]
-                )
+                polling_station_lookup[record.polling_station_id] = {record.uprn}
 
         return polling_station_lookup
 
     def remove_records_not_in_addressbase(self, addressbase_data):
-        self.elements = [e for e in self.elements if e["uprn"] in addressbase_data]
+        self.elements = [e for e in self.elements if e.uprn in addressbase_data]
 
     def remove_records_that_dont_match_addressbase(self, addressbase_data):
-        for input_record in self.elements:
-            addressbase_record = addressbase_data[input_record["uprn"].lstrip("0")]
+        postcodes = PostcodeNormaliser()
+
+        def matches_addressbase(record):
+            addressbase_record = addressbase_data[record.uprn.lstrip("0")]
+            return postcodes.normalise(record.postcode) == postcodes.normalise(
+                addressbase_record["postcode"]
+            )
 
-            if (
-                Postcode(input_record["postcode"]).with_space
-                == Postcode(addressbase_record["postcode"]).with_space
+        self.elements = [e for e in self.elements if matches_addressbase(e)]
+
+    def reconcile(self, addressbase_postcodes):
+        """
+        Remove records which
+        - have a UPRN that is assigned to more than one polling station
+        - have a UPRN that isn't in addressbase_postcodes
+        - have a postcode that doesn't match addressbase_postcodes
+
+        in a single sweep over self.elements.
+        Returns a Counter of records removed for each reason.
+        """
+        uprn_lookup = self.get_uprn_lookup()
+        postcodes = PostcodeNormaliser()
+        rejected = Counter()
+        elements = []
+
+        for record in self.elements:
+            uprn = record.uprn
+            if len(uprn_lookup[uprn]) > 1:
+                rejected["duplicate_uprn"] += 1
+                continue
+            addressbase_postcode = addressbase_postcodes.get(uprn)
+            if addressbase_postcode is None:
+                rejected["not_in_addressbase"] += 1
+                continue
+            if postcodes.normalise(record.postcode) != postcodes.normalise(
+                addressbase_postcode
             ):
+                rejected["postcode_mismatch"] += 1
                 continue
-            else:
-                self.elements.remove(input_record)
+            elements.append(record)
+
+        self.elements = elements
+        return rejected
 
     def check_records(self):
-        self.remove_duplicate_uprns()
-        addressbase_data = get_uprn_hash_table(self.council_id)
-        self.remove_records_not_in_addressbase(addressbase_data)
-        self.remove_records_that_dont_match_addressbase(addressbase_data)
+        return self.reconcile(get_uprn_postcode_table(self.council_id))
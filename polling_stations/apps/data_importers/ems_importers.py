@@ -14,7 +14,200 @@ from data_importers.addresshelpers import (
 )
 from data_importers.base_importers import BaseCsvStationsCsvAddressesImporter
 from data_finder.helpers import geocode_point_only, PostcodeError
-from uk_geo_utils.helpers import Postcode
+from uk_geo_utils.helpers import (
+    Postcode,
+    get_address_model,
+    get_onspd_model,
+    get_onsud_model,
+)
+
+
+class StationGeocodes:
+    """
+    Locations for a batch of station UPRNs and postcodes
+
+    Looking stations up one at a time costs a query per station against
+    AddressBase, so we look up every UPRN in the file in one query, and
+    geocode every distinct postcode with a query against AddressBase and
+    another against ONSPD. Anything we're asked about that wasn't in the
+    batch is looked up on demand.
+    """
+
+    def __init__(self, uprns=(), postcodes=()):
+        self.addresses = {}
+        self.points = {}
+        self.seen_uprns = set()
+        self.seen_postcodes = set()
+        self.lookup_uprns(uprns)
+        self.lookup_postcodes(postcodes)
+
+    def format_uprn(self, uprn):
+        return uprn.strip().lstrip("0")
+
+    def format_postcode(self, postcode):
+        return Postcode(postcode).with_space
+
+    def lookup_uprns(self, uprns):
+        uprns = {self.format_uprn(uprn) for uprn in uprns if uprn and uprn.strip()}
+        uprns -= self.seen_uprns
+        if not uprns:
+            return
+        self.seen_uprns |= uprns
+
+        addresses = Address.objects.filter(uprn__in=uprns).only(
+            "uprn", "postcode", "location"
+        )
+        for address in addresses:
+            self.addresses[address.uprn] = address
+
+    def lookup_postcodes(self, postcodes):
+        postcodes = {
+            self.format_postcode(postcode)
+            for postcode in postcodes
+            if postcode and postcode.strip()
+        }
+        postcodes -= self.seen_postcodes
+        if not postcodes:
+            return
+        self.seen_postcodes |= postcodes
+
+        # Resolve as many postcodes as we can in a couple of queries
+        # following the same rules as geocode_point_only(), then
+        # geocode anything that's left one at a time using the real thing
+        unresolved = self.lookup_addressbase_points(postcodes)
+        unresolved = self.lookup_onspd_points(unresolved)
+        for postcode in unresolved:
+            try:
+                self.points[postcode] = geocode_point_only(postcode).centroid
+            except PostcodeError:
+                self.points[postcode] = None
+
+    def get_centroid(self, locations):
+        # the same calculation as AddressQuerySet.centroid
+        if len(locations) == 1:
+            return locations[0]
+        poly = locations[0].union(locations[1])
+        for location in locations:
+            poly = poly.union(location)
+        return poly.centroid
+
+    def lookup_addressbase_points(self, postcodes):
+        """
+        Geocode postcodes from AddressBase, preferring postal addresses.
+        Return the postcodes that AddressBaseGeocoder wouldn't geocode.
+        """
+        gb_postcodes = {
+            postcode for postcode in postcodes if Postcode(postcode).territory != "NI"
+        }
+        if (
+            not gb_postcodes
+            or not get_address_model().objects.all().exists()
+            or not get_onsud_model().objects.all().exists()
+        ):
+            return postcodes
+
+        addresses = {}
+        for address in (
+            get_address_model()
+            .objects.filter(postcode__in=gb_postcodes)
+            .order_by("uprn")
+            .only("uprn", "postcode", "location", "addressbase_postal")
+        ):
+            addresses.setdefault(address.postcode, []).append(address)
+
+        for postcode, postcode_addresses in addresses.items():
+            postal = [a for a in postcode_addresses if a.addressbase_postal == "D"]
+            locations = [a.location for a in (postal or postcode_addresses)]
+            if all(locations):
+                self.points[postcode] = self.get_centroid(locations)
+        return postcodes - set(self.points)
+
+    def lookup_onspd_points(self, postcodes):
+        """
+        Geocode postcodes from ONSPD, ignoring terminated postcodes.
+        Return the postcodes that OnspdGeocoder wouldn't geocode.
+        """
+        onspd = get_onspd_model()
+        if not postcodes or not onspd.objects.all().exists():
+            return postcodes
+
+        records = {}
+        for record in onspd.objects.filter(pcds__in=postcodes, doterm="").only(
+            "pcds", "location"
+        ):
+            records.setdefault(record.pcds, []).append(record)
+
+        for postcode, postcode_records in records.items():
+            if len(postcode_records) == 1 and postcode_records[0].location:
+                self.points[postcode] = postcode_records[0].location
+        return postcodes - set(self.points)
+
+    def get_address(self, uprn):
+        """
+        Return the AddressBase record for uprn
+        or raise Address.DoesNotExist
+        """
+        uprn = self.format_uprn(uprn)
+        self.lookup_uprns([uprn])
+        try:
+            return self.addresses[uprn]
+        except KeyError:
+            raise Address.DoesNotExist("UPRN %s not found in AddressBase" % uprn)
+
+    def has_address(self, uprn):
+        return bool(uprn) and self.format_uprn(uprn) in self.addresses
+
+    def get_postcode_point(self, postcode):
+        """
+        Return a point for postcode or None if we can't geocode it
+        """
+        if not postcode or not postcode.strip():
+            return None
+        postcode = self.format_postcode(postcode)
+        self.lookup_postcodes([postcode])
+        return self.points.get(postcode, None)
+
+
+class StationGeocodingMixin:
+    """
+    Geocode stations from a StationGeocodes built from the whole
+    stations file the first time we need a location.
+    """
+
+    station_geocodes = None
+
+    @abc.abstractmethod
+    def get_station_geocoding_keys(self, record):
+        """
+        Return a tuple of (uprn, postcode) we would geocode the
+        station in record from. Either may be None, and both should
+        be None if the record has a usable grid reference.
+        """
+        pass
+
+    def get_station_geocodes(self):
+        if self.station_geocodes is None:
+            keys = [
+                self.get_station_geocoding_keys(record)
+                for record in self.get_stations()
+            ]
+            geocodes = StationGeocodes(uprns=[uprn for uprn, postcode in keys])
+            if self.allow_station_point_from_postcode:
+                # we only fall back to the postcode if we can't find the UPRN
+                geocodes.lookup_postcodes(
+                    [
+                        postcode
+                        for uprn, postcode in keys
+                        if not geocodes.has_address(uprn)
+                    ]
+                )
+            self.station_geocodes = geocodes
+        return self.station_geocodes
+
+    def geocode_station_postcode(self, postcode):
+        if not self.allow_station_point_from_postcode:
+            return None
+        return self.get_station_geocodes().get_postcode_point(postcode)
 
 
 """
@@ -29,8 +222,11 @@ This is the parent class for both of them.
 """
 
 
-class BaseXpressCsvImporter(BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta):
+class BaseXpressCsvImporter(
+    StationGeocodingMixin, BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta
+):
     csv_delimiter = ","
+    csv_stream = True
 
     # Set this to false in an import script if we want to only set a station
     # point based on UPRN or co-ordinates (even if we've got a valid postcode)
@@ -76,23 +272,21 @@ class BaseXpressCsvImporter(BaseCsvStationsCsvAddressesImporter, metaclass=abc.A
     def get_station_postcode(self, record):
         return getattr(record, self.station_postcode_field).strip()
 
-    def geocode_from_postcode(self, record):
-        if not self.allow_station_point_from_postcode:
-            return None
+    def get_station_geocoding_keys(self, record):
+        if self.has_station_grid_ref(record):
+            return (None, None)
+        uprn = None
+        if self.station_uprn_field:
+            uprn = getattr(record, self.station_uprn_field)
+        return (uprn, self.get_station_postcode(record))
 
-        postcode = self.get_station_postcode(record)
-        if not postcode:
-            return None
-        try:
-            location_data = geocode_point_only(postcode)
-            return location_data.centroid
-        except PostcodeError:
-            return None
+    def geocode_from_postcode(self, record):
+        return self.geocode_station_postcode(self.get_station_postcode(record))
 
     def geocode_from_uprn(self, record):
         uprn = getattr(record, self.station_uprn_field)
         uprn = uprn.lstrip("0")
-        ab_rec = Address.objects.get(uprn=uprn)
+        ab_rec = self.get_station_geocodes().get_address(uprn)
         ab_postcode = Postcode(ab_rec.postcode)
         station_postcode = Postcode(self.get_station_postcode(record))
         if ab_postcode != station_postcode:
@@ -107,17 +301,20 @@ class BaseXpressCsvImporter(BaseCsvStationsCsvAddressesImporter, metaclass=abc.A
             )
         return ab_rec.location
 
-    def get_station_point(self, record):
-        location = None
-
-        if (
+    def has_station_grid_ref(self, record):
+        return (
             hasattr(record, self.easting_field)
             and hasattr(record, self.northing_field)
             and getattr(record, self.easting_field) != "0"
             and getattr(record, self.easting_field) != ""
             and getattr(record, self.northing_field) != "0"
             and getattr(record, self.northing_field) != ""
-        ):
+        )
+
+    def get_station_point(self, record):
+        location = None
+
+        if self.has_station_grid_ref(record):
 
             # if we've got points, use them
             location = Point(
@@ -319,9 +516,10 @@ but we can override them if necessary
 
 
 class BaseHalaroseCsvImporter(
-    BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta
+    StationGeocodingMixin, BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta
 ):
     csv_delimiter = ","
+    csv_stream = True
     station_postcode_field = "pollingstationpostcode"
     station_address_fields = [
         "pollingstationname",
@@ -351,24 +549,13 @@ class BaseHalaroseCsvImporter(
         )
         return address
 
-    def get_station_point(self, record):
-        if not self.allow_station_point_from_postcode:
-            return None
-
-        location = None
+    def get_station_geocoding_keys(self, record):
+        return (None, getattr(record, self.station_postcode_field))
 
+    def get_station_point(self, record):
         # geocode using postcode
         postcode = getattr(record, self.station_postcode_field).strip()
-        if postcode == "":
-            return None
-
-        try:
-            location_data = geocode_point_only(postcode)
-            location = location_data.centroid
-        except PostcodeError:
-            location = None
-
-        return location
+        return self.geocode_station_postcode(postcode)
 
     def station_record_to_dict(self, record):
 
@@ -457,10 +644,11 @@ but we can override them if necessary
 
 
 class BaseDemocracyCountsCsvImporter(
-    BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta
+    StationGeocodingMixin, BaseCsvStationsCsvAddressesImporter, metaclass=abc.ABCMeta
 ):
 
     csv_delimiter = ","
+    csv_stream = True
     station_name_field = "placename"
     address_fields = ["add1", "add2", "add3", "add4", "add5", "add6"]
     postcode_field = "postcode"
@@ -492,29 +680,26 @@ class BaseDemocracyCountsCsvImporter(
             "uprn": uprn,
         }
 
+    def has_station_grid_ref(self, record):
+        badvalues = ["", "0", "0.00"]
+        return record.xordinate not in badvalues and record.yordinate not in badvalues
+
+    def get_station_geocoding_keys(self, record):
+        if self.has_station_grid_ref(record):
+            return (None, None)
+        return (None, record.postcode)
+
     def get_station_point(self, record):
         location = None
 
-        badvalues = ["", "0", "0.00"]
-        if record.xordinate not in badvalues and record.yordinate not in badvalues:
+        if self.has_station_grid_ref(record):
             # if we've got points, use them
             location = Point(
                 float(record.xordinate), float(record.yordinate), srid=27700
             )
         else:
-            if not self.allow_station_point_from_postcode:
-                return None
-
             # otherwise, geocode using postcode
-            postcode = record.postcode.strip()
-            if postcode == "":
-                return None
-
-            try:
-                location_data = geocode_point_only(postcode)
-                location = location_data.centroid
-            except PostcodeError:
-                location = None
+            location = self.geocode_station_postcode(record.postcode.strip())
 
         return location
 
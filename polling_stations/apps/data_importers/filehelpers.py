@@ -1,8 +1,11 @@
 import csv
-import fnmatch
+import fcntl
+import io
 import json
 import os
+import re
 import shapefile
+import shutil
 import tempfile
 import zipfile
 
@@ -11,29 +14,21 @@ from collections import namedtuple
 from django.contrib.gis.gdal import DataSource
 
 
-def recursive_find(path, pattern):
-    matches = []
-    for root, dirnames, filenames in os.walk(path):
-        for filename in fnmatch.filter(filenames, pattern):
-            matches.append(os.path.join(root, filename))
-    return matches
-
-
 class CsvHelper:
     """
     Helper class for reading data from CSV files
     """
 
-    def __init__(self, filepath, encoding="utf-8", delimiter=","):
+    def __init__(self, filepath, encoding="utf-8", delimiter=",", stream=False):
         self.filepath = filepath
         self.encoding = encoding
         self.delimiter = delimiter
+        self.stream = stream
 
-    def get_features(self):
-        file = open(self.filepath, "rt", encoding=self.encoding)
-        reader = csv.reader(file, delimiter=self.delimiter)
-        header = next(reader)
+    def open(self):
+        return open(self.filepath, "rt", encoding=self.encoding)
 
+    def get_row_klass(self, header):
         # mimic the data structure generated by ffs so existing import
         # scripts don't break
 
@@ -57,44 +52,386 @@ class CsvHelper:
             while "__" in s:
                 s = s.replace("__", "_")
             clean.append(s)
-        RowKlass = namedtuple("RowKlass", clean)
+        return namedtuple("RowKlass", clean)
+
+    def get_features(self):
+        if self.stream:
+            return CsvFeatures(self)
+
+        with self.open() as file:
+            reader = csv.reader(file, delimiter=self.delimiter)
+            RowKlass = self.get_row_klass(next(reader))
+            return list(map(RowKlass._make, reader))
+
 
-        data = []
-        for row in map(RowKlass._make, reader):
-            data.append(row)
+class CsvFeatures:
+    """
+    Lazy, re-iterable sequence of rows from a CSV file.
+
+    Rows are parsed one at a time each time we iterate, so peak memory
+    doesn't grow with the size of the file. This means we can iterate
+    over the same file more than once (e.g: to read stations and
+    addresses from a single EMS export) without holding it in memory.
+
+    len() is answered by a pre-scan which only counts rows, or from the
+    count we recorded on a previous complete iteration.
+    """
 
-        file.close()
-        return data
+    def __init__(self, helper):
+        self.helper = helper
+        self.count = None
+
+    def __iter__(self):
+        with self.helper.open() as file:
+            reader = csv.reader(file, delimiter=self.helper.delimiter)
+            RowKlass = self.helper.get_row_klass(next(reader))
+            count = 0
+            for row in reader:
+                count += 1
+                yield RowKlass._make(row)
+        self.count = count
+
+    def __len__(self):
+        if self.count is None:
+            with self.helper.open() as file:
+                reader = csv.reader(file, delimiter=self.helper.delimiter)
+                next(reader)
+                self.count = sum(1 for _ in reader)
+        return self.count
 
 
 class ShpHelper:
     """
     Helper class for reading geographic data from ESRI SHP files
+
+    If the shapefile is in a zip, we read the .shp, .shx and .dbf
+    members straight from the archive instead of extracting them.
+
+    If records_only is True we only open the .dbf, so we never read
+    any geometry. Otherwise geometry is only parsed for features whose
+    .shape we actually use (see ShpFeature).
     """
 
-    def __init__(self, filepath, zip=False, encoding="utf-8"):
+    def __init__(self, filepath, zip=False, encoding="utf-8", records_only=False):
         self.filepath = filepath
         self.zip = zip
         self.encoding = encoding
+        self.records_only = records_only
+
+    def find_shp_member(self, zip_file):
+        shp_files = [
+            name
+            for name in zip_file.namelist()
+            if name.lower().endswith(".shp") and not name.startswith("__MACOSX/")
+        ]
+        if len(shp_files) != 1:
+            raise ValueError("Found %i shapefiles in archive" % len(shp_files))
+        return shp_files[0]
+
+    def open_zip_reader(self):
+        # the archive stays open until the members we open are closed
+        with zipfile.ZipFile(self.filepath, "r") as zip_file:
+            stem = os.path.splitext(self.find_shp_member(zip_file))[0]
+            members = {
+                os.path.splitext(name)[1].lower(): name
+                for name in zip_file.namelist()
+                if os.path.splitext(name)[0] == stem
+            }
+
+            files = {}
+            exts = [".dbf"] if self.records_only else [".shp", ".shx", ".dbf"]
+            for ext in exts:
+                if ext in members:
+                    files[ext[1:]] = zip_file.open(members[ext])
+        if "shx" in files:
+            # the index is small and pyshp wants to read it in one go
+            with files["shx"] as shx:
+                files["shx"] = io.BytesIO(shx.read())
+        return shapefile.Reader(encoding=self.encoding, **files)
+
+    def open_reader(self):
+        if self.zip:
+            return self.open_zip_reader()
+        if self.records_only:
+            stem = os.path.splitext(self.filepath)[0]
+            for ext in [".dbf", ".DBF"]:
+                if os.path.exists(stem + ext):
+                    return shapefile.Reader(
+                        dbf=open(stem + ext, "rb"), encoding=self.encoding
+                    )
+        return shapefile.Reader(self.filepath, encoding=self.encoding)
 
     def get_features(self):
-        # If our shapefile is in a zip, extract it
-        # otherwise, we can read it directly
-        if self.zip:
-            zip_file = zipfile.ZipFile(self.filepath, "r")
-            tmpdir = tempfile.mkdtemp()
-            zip_file.extractall(tmpdir)
+        return ShpFeatures(self)
+
+
+class ShpFeature:
+    """
+    A record from a shapefile, along with its geometry.
+
+    .record is read as we iterate, but .shape is only parsed from the
+    .shp file the first time we access it (using the offset from the
+    .shx index), so we don't pay for geometry on records we skip.
+    """
+
+    __slots__ = ("record", "_reader", "_index", "_shape")
+    _unread = object()
 
-            shp_files = recursive_find(tmpdir, "*.shp")
-            if len(shp_files) != 1:
-                raise ValueError("Found %i shapefiles in archive" % len(shp_files))
-            shp_file = shp_files[0]
+    def __init__(self, record, reader=None, index=None, shape=_unread):
+        self.record = record
+        self._reader = reader
+        self._index = index
+        self._shape = shape
+
+    @property
+    def shape(self):
+        if self._shape is ShpFeature._unread:
+            self._shape = self._reader.shape(self._index)
+            self._reader = None
+        return self._shape
+
+    def __repr__(self):
+        return "ShpFeature(record=%r)" % (self.record,)
+
+
+class ShpFeatures:
+    """
+    Lazy, re-iterable sequence of ShpFeatures from a shapefile.
+
+    Like CsvFeatures, we open the file each time we iterate and close it
+    when we're done, so a feature's geometry must be read (if at all)
+    before the iteration that produced it finishes.
+    """
 
-            sf = shapefile.Reader(shp_file, encoding=self.encoding)
-            return sf.shapeRecords()
+    def __init__(self, helper):
+        self.helper = helper
+        self.count = None
+
+    def __len__(self):
+        if self.count is None:
+            with self.helper.open_reader() as reader:
+                self.count = len(reader)
+        return self.count
+
+    def __iter__(self):
+        with self.helper.open_reader() as reader:
+            yield from self.iter_features(reader)
+
+    @staticmethod
+    def iter_features(reader):
+        records = reader.iterRecords()
+        if not reader.shp:
+            for record in records:
+                yield ShpFeature(record, shape=None)
+        elif reader.shx:
+            for i, record in enumerate(records):
+                yield ShpFeature(record, reader, i)
         else:
-            sf = shapefile.Reader(self.filepath, encoding=self.encoding)
-            return sf.shapeRecords()
+            # no index, so we can't seek to a shape: read them in order
+            for shape, record in zip(reader.iterShapes(), records):
+                yield ShpFeature(record, shape=shape)
+
+
+class ShpPartitioner:
+    """
+    Split a shapefile into one shapefile per key, in a single pass.
+
+    Some datasets (e.g: the Scotland SpatialHub) cover lots of councils
+    in one file. Rather than every council's importer reading the whole
+    thing and discarding most of it, the first one to ask for a
+    partition reads the file once, writes each key's records to its
+    own shapefile, and everyone reads their own partition after that.
+
+    Partitions are cached in partitions_path, in a directory named for
+    the size and mtime of the source file, so they're rebuilt when the
+    source changes. The build is done under a lock and moved into place
+    when it's complete, so concurrent importers wait for one build
+    rather than each doing their own. Callers sharing a partitions_path
+    must use the same key function.
+    """
+
+    def __init__(self, filepath, partitions_path, key, encoding="utf-8"):
+        self.filepath = filepath
+        self.partitions_path = partitions_path
+        self.key = key
+        self.encoding = encoding
+
+    @property
+    def source_name(self):
+        return os.path.splitext(os.path.basename(self.filepath))[0]
+
+    @property
+    def cache_path(self):
+        stat = os.stat(self.filepath)
+        return os.path.join(
+            self.partitions_path,
+            "%s-%i-%i" % (self.source_name, stat.st_size, stat.st_mtime_ns),
+        )
+
+    def write_partitions(self, path):
+        reader = ShpHelper(self.filepath, encoding=self.encoding).open_reader()
+        writers = {}
+        try:
+            for feature in ShpFeatures.iter_features(reader):
+                key = self.key(feature.record)
+                if not key:
+                    continue
+                if key not in writers:
+                    writer = shapefile.Writer(
+                        os.path.join(path, "partition-%i" % len(writers)),
+                        shapeType=reader.shapeType,
+                        encoding=self.encoding,
+                    )
+                    for field in reader.fields[1:]:
+                        writer.field(*field)
+                    writers[key] = writer
+                writers[key].shape(feature.shape)
+                writers[key].record(*feature.record)
+        finally:
+            for writer in writers.values():
+                writer.close()
+            reader.close()
+
+        index = {key: "partition-%i.shp" % i for i, key in enumerate(writers)}
+        with open(os.path.join(path, "index.json"), "wt") as f:
+            json.dump(index, f)
+
+    def remove_old_partitions(self, cache_path):
+        for name in os.listdir(self.partitions_path):
+            path = os.path.join(self.partitions_path, name)
+            if (
+                name.startswith(self.source_name + "-")
+                and path != cache_path
+                and os.path.isdir(path)
+            ):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def partition(self):
+        """
+        Make sure the partitions exist and return the directory they're in
+        """
+        cache_path = self.cache_path
+        if os.path.exists(cache_path):
+            return cache_path
+
+        os.makedirs(self.partitions_path, exist_ok=True)
+        lock_path = os.path.join(self.partitions_path, self.source_name + ".lock")
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # someone else may have built them while we waited for the lock
+            if not os.path.exists(cache_path):
+                tmp_path = "%s.%i.tmp" % (cache_path, os.getpid())
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                os.makedirs(tmp_path)
+                try:
+                    self.write_partitions(tmp_path)
+                    os.rename(tmp_path, cache_path)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                self.remove_old_partitions(cache_path)
+        return cache_path
+
+    def get_partition(self, key):
+        """
+        Return the path to the shapefile holding the records for key,
+        or None if there weren't any
+        """
+        cache_path = self.partition()
+        with open(os.path.join(cache_path, "index.json")) as f:
+            index = json.load(f)
+        if key not in index:
+            return None
+        return os.path.join(cache_path, index[key])
+
+
+class JsonStream:
+    """
+    Decode JSON from a file a piece at a time.
+
+    We keep a buffer of the file and use JSONDecoder.raw_decode() to
+    pull values off the front of it. If a value doesn't fit in what
+    we've read so far, we read as much again as we've got buffered and
+    retry, so decoding a big value is still linear in its size.
+    """
+
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, file, chunk_size=1024 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size):
+        data = self.file.read(size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character ("" at the end)
+        """
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos : self.pos + 1]
+            self.fill(self.chunk_size)
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                "Expected one of %r at offset %i, found %r" % (chars, self.pos, char)
+            )
+        self.pos += 1
+        return char
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may continue in the file
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def iter_array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object_member(self, name):
+        """
+        Find the member called name in the object we're at the start of,
+        and yield the items of its value (which should be an array).
+        Other members are decoded and discarded.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            if key == name:
+                yield from self.iter_array()
+            else:
+                self.decode()
+            if self.expect(",}") == "}":
+                return
 
 
 class GeoJsonHelper:
@@ -105,9 +442,44 @@ class GeoJsonHelper:
     def __init__(self, filepath):
         self.filepath = filepath
 
+    def open(self):
+        return open(self.filepath, "rt", encoding="utf-8")
+
     def get_features(self):
-        geometries = json.load(open(self.filepath))
-        return geometries["features"]
+        return GeoJsonFeatures(self)
+
+
+class GeoJsonFeatures:
+    """
+    Lazy, re-iterable sequence of features from a GeoJSON
+    FeatureCollection.
+
+    Like CsvFeatures, features are decoded one at a time as we iterate,
+    so we never hold the whole file in memory. len() comes from the
+    count we recorded on a previous complete iteration, or the first
+    time it's asked for, from a pass which decodes (but doesn't keep)
+    every feature.
+    """
+
+    def __init__(self, helper):
+        self.helper = helper
+        self.count = None
+
+    def iter_features(self):
+        with self.helper.open() as file:
+            yield from JsonStream(file).iter_object_member("features")
+
+    def __iter__(self):
+        count = 0
+        for feature in self.iter_features():
+            count += 1
+            yield feature
+        self.count = count
+
+    def __len__(self):
+        if self.count is None:
+            self.count = sum(1 for _ in self.iter_features())
+        return self.count
 
 
 class JsonHelper:
@@ -119,7 +491,8 @@ class JsonHelper:
         self.filepath = filepath
 
     def get_features(self):
-        return json.load(open(self.filepath))
+        with open(self.filepath) as f:
+            return json.load(f)
 
 
 class KmlHelper:
@@ -161,10 +534,13 @@ class FileHelperFactory:
 
     @staticmethod
     def create(filetype, filepath, options):
-        if filetype == "shp":
-            return ShpHelper(filepath, zip=False, encoding=options["shp_encoding"])
-        elif filetype == "shp.zip":
-            return ShpHelper(filepath, zip=True, encoding=options["shp_encoding"])
+        if filetype in ["shp", "shp.zip"]:
+            return ShpHelper(
+                filepath,
+                zip=filetype == "shp.zip",
+                encoding=options["shp_encoding"],
+                records_only=options.get("shp_records_only", False),
+            )
         elif filetype == "kml":
             return KmlHelper(filepath)
         elif filetype == "geojson":
@@ -173,7 +549,10 @@ class FileHelperFactory:
             return JsonHelper(filepath)
         elif filetype == "csv":
             return CsvHelper(
-                filepath, options["csv_encoding"], options["csv_delimiter"]
+                filepath,
+                options["csv_encoding"],
+                options["csv_delimiter"],
+                options.get("csv_stream", False),
             )
         else:
             raise ValueError("Unexpected file type: %s" % (filetype))
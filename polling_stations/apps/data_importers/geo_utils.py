@@ -1,9 +1,101 @@
+import bisect
+import uuid
+from ctypes import byref, c_void_p, create_string_buffer
+
 from django.db import transaction
 from django.db import connection
+from django.utils.encoding import force_bytes
 from pollingstations.models import PollingDistrict
+from django.contrib.gis.gdal import DataSource
+from django.contrib.gis.gdal.libgdal import std_call
+from django.contrib.gis.gdal.prototypes.generation import int_output
+from django.contrib.gis.gdal.prototypes.raster import (
+    create_vsi_file_from_mem_buffer,
+    unlink_vsi_file,
+)
 from django.contrib.gis.geos import MultiPolygon, Polygon, LinearRing
 
 
+class CouncilAreaIndex:
+    """
+    In-memory index for answering "which council covers this point?"
+
+    We hold a prepared geometry for each council area, so repeated
+    point-in-polygon tests don't need a DB query and are cheap in GEOS.
+    Councils are kept sorted by the western edge of their bounding box,
+    so we can skip any council that starts east of the point without
+    touching it, and we check the rest of the bounding box before we
+    check the (much slower) geometry itself.
+    """
+
+    def __init__(self, councils, srid=4326):
+        self.srid = srid
+        entries = []
+        for council in councils:
+            if council.area is None:
+                continue
+            area = council.area
+            if area.srid != srid:
+                area = area.transform(srid, clone=True)
+            entries.append((area.extent, area.prepared, council))
+        self.entries = sorted(entries, key=lambda entry: entry[0][0])
+        self.xmins = [entry[0][0] for entry in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def covering(self, point):
+        """
+        Return a list of councils whose area covers point
+        """
+        if point.srid and point.srid != self.srid:
+            point = point.transform(self.srid, clone=True)
+        x, y = point.x, point.y
+        matches = []
+        for extent, prepared, council in self.entries[
+            : bisect.bisect_right(self.xmins, x)
+        ]:
+            xmin, ymin, xmax, ymax = extent
+            if x <= xmax and ymin <= y <= ymax and prepared.covers(point):
+                matches.append(council)
+        return matches
+
+
+close_vsi_file = int_output(std_call("VSIFCloseL"), [c_void_p])
+
+
+def read_gml_geometries(documents):
+    """
+    Parse a batch of GML documents, returning a list of the GEOS
+    geometries found in each one.
+
+    Each document is written to GDAL's in-memory filesystem (/vsimem/)
+    and opened from there, so we don't touch the disk. GDAL may also
+    write a .gfs schema file next to each document; we remove both.
+    """
+    results = []
+    for document in documents:
+        data = force_bytes(document)
+        buffer = create_string_buffer(data, len(data))
+        path = "/vsimem/%s" % uuid.uuid4()
+        close_vsi_file(
+            create_vsi_file_from_mem_buffer(
+                force_bytes(path + ".gml"), byref(buffer), len(data), False
+            )
+        )
+        try:
+            ds = DataSource(path + ".gml")
+            geometries = []
+            if ds.layer_count:
+                geometries = [feature.geom.geos for feature in ds[0]]
+            del ds
+        finally:
+            unlink_vsi_file(force_bytes(path + ".gml"))
+            unlink_vsi_file(force_bytes(path + ".gfs"))
+        results.append(geometries)
+    return results
+
+
 def convert_linestring_to_multiploygon(linestring):
     points = linestring.coords
 
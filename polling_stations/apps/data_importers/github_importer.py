@@ -1,10 +1,8 @@
 import abc
 import json
-import tempfile
 from django.contrib.gis.geos import GEOSGeometry
-from django.contrib.gis.gdal import DataSource
-from django.utils.encoding import force_bytes
 from data_importers.base_importers import BaseGenericApiImporter
+from data_importers.geo_utils import read_gml_geometries
 
 
 class BaseGitHubImporter(BaseGenericApiImporter, metaclass=abc.ABCMeta):
@@ -17,6 +15,9 @@ class BaseGitHubImporter(BaseGenericApiImporter, metaclass=abc.ABCMeta):
     srid = 4326
     districts_srid = 4326
 
+    gml_geometries = None
+    pending_gml_records = None
+
     @property
     def stations_url(self):
         return self.base_url % (
@@ -50,13 +51,53 @@ class BaseGitHubImporter(BaseGenericApiImporter, metaclass=abc.ABCMeta):
         poly.srid = srid
         return poly
 
+    def get_districts(self):
+        districts = super().get_districts()
+        self.add_pending_gml_records(districts)
+        return districts
+
+    def get_stations(self):
+        stations = super().get_stations()
+        self.add_pending_gml_records(stations)
+        return stations
+
+    def add_pending_gml_records(self, records):
+        if getattr(self, "geom_type", None) != "gml":
+            return
+        if self.pending_gml_records is None:
+            self.pending_gml_records = []
+        self.pending_gml_records.extend(records)
+
+    def clean_gml(self, gml):
+        """
+        Hook to fix up GML before we parse it
+        """
+        return gml
+
+    def load_gml_geometries(self, documents):
+        if self.gml_geometries is None:
+            self.gml_geometries = {}
+        documents = list(
+            dict.fromkeys(d for d in documents if d not in self.gml_geometries)
+        )
+        geometries = read_gml_geometries([self.clean_gml(d) for d in documents])
+        self.gml_geometries.update(zip(documents, geometries))
+
     def extract_gml_geometry(self, record, srid):
-        with tempfile.NamedTemporaryFile() as tmp:
-            tmp.write(force_bytes(record["geometry"]))
-            tmp.seek(0)
-            ds = DataSource(tmp.name)
-            if len(ds[0]) == 1:
-                wkt = next(iter(ds[0])).geom.wkt
-                return self.clean_poly(GEOSGeometry(wkt, srid=srid))
-            else:
-                raise ValueError("Expected 1 feature, found %i" % len(ds[0]))
+        """
+        The first time we're asked for a geometry, we parse the GML for
+        every record we've fetched in one batch, and cache the results
+        by the GML they came from
+        """
+        if self.pending_gml_records:
+            self.load_gml_geometries(r["geometry"] for r in self.pending_gml_records)
+            self.pending_gml_records = None
+        if not self.gml_geometries or record["geometry"] not in self.gml_geometries:
+            self.load_gml_geometries([record["geometry"]])
+
+        geometries = self.gml_geometries[record["geometry"]]
+        if len(geometries) != 1:
+            raise ValueError("Expected 1 feature, found %i" % len(geometries))
+        geom = geometries[0].clone()
+        geom.srid = srid
+        return self.clean_poly(geom)
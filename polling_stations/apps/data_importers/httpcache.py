@@ -0,0 +1,123 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+
+import requests
+
+
+"""
+Local cache of the files our API importers download
+
+Responses are stored by URL (s.t: httpcache/<sha256 of url>) along
+with the ETag and Last-Modified headers they came with. Next time we
+want the same URL, we send a conditional request, so if the file
+hasn't changed the server just sends us a 304. If we fetched it less
+than max_age seconds ago, we don't make a request at all.
+
+In offline mode we never make a request: we use whatever we've got
+cached and fail if we haven't got it.
+"""
+
+
+class DownloadCache:
+    max_age = 300
+    timeout = 60
+    chunk_size = 1024 * 1024
+
+    def __init__(self, base_path="./httpcache/", offline=False):
+        self.base_path = os.path.abspath(base_path)
+        self.offline = offline
+
+    def get_path(self, url):
+        return os.path.join(
+            self.base_path, hashlib.sha256(url.encode("utf-8")).hexdigest()
+        )
+
+    def read_metadata(self, path):
+        try:
+            with open(path + ".json") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_metadata(self, path, metadata):
+        tmp_path = "%s.json.%i.tmp" % (path, os.getpid())
+        with open(tmp_path, "wt") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, path + ".json")
+
+    def get_conditional_headers(self, metadata):
+        headers = {}
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+        return headers
+
+    def download(self, url, path, metadata):
+        """
+        Make a (conditional, if we've got a copy) request for url.
+        Returns True if we got a new copy.
+        """
+        headers = {}
+        if metadata and os.path.exists(path):
+            headers = self.get_conditional_headers(metadata)
+
+        with requests.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code == 304:
+                return False
+            response.raise_for_status()
+
+            tmp_path = "%s.%i.tmp" % (path, os.getpid())
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            metadata.update(
+                {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+            )
+            return True
+
+    def fetch(self, url):
+        """
+        Return the path to an up-to-date local copy of url
+        """
+        path = self.get_path(url)
+        metadata = self.read_metadata(path)
+
+        if self.offline:
+            if metadata is None or not os.path.exists(path):
+                raise ValueError("%s isn't in the download cache" % url)
+            return path
+
+        os.makedirs(self.base_path, exist_ok=True)
+        with open(path + ".lock", "w") as lock:
+            # if someone else is fetching this url, wait for them
+            # and then (probably) use what they fetched
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            metadata = self.read_metadata(path)
+            if (
+                metadata is not None
+                and os.path.exists(path)
+                and time.time() - metadata["fetched"] < self.max_age
+            ):
+                return path
+
+            metadata = metadata or {}
+            self.download(url, path, metadata)
+            metadata.update({"url": url, "fetched": time.time()})
+            self.write_metadata(path, metadata)
+
+        return path
@@ -1,12 +1,26 @@
+import json
 import logging
 import pprint
+from collections import Counter
 
 
 class LogHelper:
+    """
+    Importers log something for most records they see, so log_message()
+    has to be cheap when nothing is going to be written:
+
+    - We check the level before formatting anything.
+    - Every call is counted by event type (its message template).
+    - Past sample_after events of the same type, INFO and DEBUG messages
+      are only counted. log_summary() reports how many we skipped.
+    - If we've been given an events_path, every enabled event is also
+      written there as a line of JSON.
+    """
 
     logger = None
+    sample_after = 100
 
-    def __init__(self, verbosity):
+    def __init__(self, verbosity, events_path=None):
         logformat = "%(levelname)s: %(message)s"
         logging.basicConfig(format=logformat)
         logger = logging.getLogger(__name__)
@@ -19,18 +33,60 @@ class LogHelper:
         elif verbosity >= 3:
             logger.setLevel(logging.DEBUG)
         self.logger = logger
+        self.event_counts = Counter()
+        self.skipped_counts = Counter()
+        self.events_file = None
+        if events_path:
+            self.events_file = open(events_path, "wt")
+
+    def format_message(self, message, variable=None, pretty=False):
+        if not variable:
+            return message
+        if pretty:
+            try:
+                return message % pprint.pformat(variable._asdict(), indent=4)
+            except AttributeError:
+                return message % pprint.pformat(variable, indent=4)
+        return message % variable
+
+    def write_event(self, level, message, variable):
+        try:
+            data = variable._asdict()
+        except AttributeError:
+            data = variable
+        event = {
+            "level": logging.getLevelName(level),
+            "event": message,
+            "data": data,
+        }
+        self.events_file.write(json.dumps(event, default=str))
+        self.events_file.write("\n")
 
     def log_message(self, level, message, variable=None, pretty=False):
-        log_str = ""
-        if variable:
-            if pretty:
-                try:
-                    log_str = message % pprint.pformat(variable._asdict(), indent=4)
-                except AttributeError:
-                    log_str = message % pprint.pformat(variable, indent=4)
-            else:
-                log_str = message % variable
-        else:
-            log_str = message
-
-        self.logger.log(level, log_str)
+        self.event_counts[message] += 1
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if self.events_file:
+            self.write_event(level, message, variable)
+
+        if level < logging.WARNING and self.event_counts[message] > self.sample_after:
+            self.skipped_counts[message] += 1
+            return
+
+        self.logger.log(level, self.format_message(message, variable, pretty))
+
+    def log_summary(self):
+        for message, count in sorted(self.skipped_counts.items()):
+            self.logger.log(
+                logging.INFO,
+                "%i more '%s' messages not shown",
+                count,
+                message.splitlines()[0].strip(),
+            )
+
+    def close(self):
+        self.log_summary()
+        if self.events_file:
+            self.events_file.close()
+            self.events_file = None
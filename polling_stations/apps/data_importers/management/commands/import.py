@@ -1,13 +1,21 @@
-import glob, os, re, traceback
+import os, re, time, traceback
+from collections import namedtuple
 from importlib.machinery import SourceFileLoader
 from multiprocessing import Pool
 from django import db
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
+from data_importers.registry import ImporterRegistry, STATIC_ATTRIBUTES
 from pollingstations.models import PollingStation
 
 
+ImportResult = namedtuple(
+    "ImportResult", ["council_id", "script", "status", "duration", "error"]
+)
+
+
 # does this regular expression match any of the elements in this list?
 def match_in(regex, lst):
     for el in lst:
@@ -22,14 +30,52 @@ def load_command(f):
     return command.Command()
 
 
+# read the attributes the registry couldn't find statically by loading file f
+def load_metadata(f):
+    cmd = load_command(f)
+    metadata = {
+        attr: getattr(cmd, attr) for attr in STATIC_ATTRIBUTES if hasattr(cmd, attr)
+    }
+    metadata["run_in_series"] = hasattr(cmd, "run_in_series")
+    return metadata
+
+
 # run a django management command from file f
+# and report how it went, rather than raising
 def run_cmd(f, opts):
-    cmd = load_command(f)
+    start = time.time()
+    council_id = None
     try:
+        cmd = load_command(f)
+        council_id = cmd.council_id
         cmd.handle(**opts)
-    except Exception as e:
+    except Exception:
         traceback.print_exc()
-        raise e
+        return ImportResult(
+            council_id,
+            os.path.basename(f),
+            "FAILED",
+            time.time() - start,
+            traceback.format_exc(limit=1).strip().splitlines()[-1],
+        )
+    return ImportResult(council_id, os.path.basename(f), "OK", time.time() - start, "")
+
+
+def run_cmd_from_tuple(args):
+    return run_cmd(*args)
+
+
+# total size of the input files an import script will read, if we can find them
+def get_input_size(council_id, filenames):
+    data_path = getattr(settings, "PRIVATE_DATA_PATH", None)
+    if not data_path or not council_id:
+        return 0
+    size = 0
+    for filename in set(filenames):
+        path = os.path.join(data_path, council_id, filename)
+        if os.path.isfile(path):
+            size += os.path.getsize(path)
+    return size
 
 
 """
@@ -80,6 +126,29 @@ class Command(BaseCommand):
             default=False,
         )
 
+        parser.add_argument(
+            "--diff",
+            help="<Optional> Only write records which have changed since the last import",
+            action="store_true",
+            required=False,
+            default=False,
+        )
+
+        parser.add_argument(
+            "--log-events",
+            help="<Optional> Directory to write each council's log events to as JSON lines",
+            required=False,
+            default=None,
+        )
+
+        parser.add_argument(
+            "--offline",
+            help="<Optional> API importers use the responses cached by a previous run instead of making HTTP requests",
+            action="store_true",
+            required=False,
+            default=False,
+        )
+
         parser.add_argument(
             "-m",
             "--multiprocessing",
@@ -89,6 +158,15 @@ class Command(BaseCommand):
             default=False,
         )
 
+        parser.add_argument(
+            "-j",
+            "--workers",
+            help="<Optional> Number of worker processes to use with --multiprocessing (default: number of CPUs)",
+            type=int,
+            required=False,
+            default=None,
+        )
+
     def importer_covers_these_elections(
         self, args_elections, importer_elections, regex
     ):
@@ -110,15 +188,69 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(line[1])
 
+    def output_results(self, results):
+        self.stdout.write(
+            "{:<12} {:<40} {:<8} {:>9}".format(
+                "Council", "Script", "Status", "Time (s)"
+            )
+        )
+        for result in sorted(results, key=lambda r: r.duration, reverse=True):
+            line = "{:<12} {:<40} {:<8} {:>9.1f}".format(
+                str(result.council_id),
+                result.script,
+                result.status,
+                result.duration,
+            )
+            if result.status == "OK":
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.ERROR(line))
+                self.stdout.write(self.style.ERROR("    " + result.error))
+
+        failed = len([r for r in results if r.status != "OK"])
+        self.stdout.write(
+            "%i import scripts run: %i succeeded, %i failed, %.1fs total"
+            % (
+                len(results),
+                len(results) - failed,
+                failed,
+                sum(r.duration for r in results),
+            )
+        )
+        return failed
+
+    def report_result(self, result):
+        if result.status == "OK":
+            self.stdout.write(
+                "%s (%s) imported in %.1fs"
+                % (result.council_id, result.script, result.duration)
+            )
+        else:
+            self.stdout.write(
+                self.style.ERROR(
+                    "%s (%s) FAILED after %.1fs: %s"
+                    % (result.council_id, result.script, result.duration, result.error)
+                )
+            )
+
     def run_commands_in_series(self, commands):
+        results = []
         for f, opts in commands:
-            run_cmd(f, opts)
-
-    def run_commands_in_parallel(self, commands):
-        pool = Pool()
-        pool.starmap_async(run_cmd, commands)
-        pool.close()
-        pool.join()
+            result = run_cmd(f, opts)
+            self.report_result(result)
+            results.append(result)
+        return results
+
+    def run_commands_in_parallel(self, commands, workers=None):
+        results = []
+        with Pool(processes=workers) as pool:
+            # chunksize=1 so a big council doesn't hold up a queue of small ones
+            for result in pool.imap_unordered(
+                run_cmd_from_tuple, commands, chunksize=1
+            ):
+                self.report_result(result)
+                results.append(result)
+        return results
 
     def handle(self, *args, **kwargs):
         """
@@ -135,61 +267,84 @@ class Command(BaseCommand):
         )
 
         base_path = os.path.dirname(__file__)
-        files = glob.glob(base_path + "/import_*.py")
+        registry = ImporterRegistry(
+            base_path, getattr(settings, "IMPORTER_REGISTRY_CACHE", None)
+        )
+        scripts = registry.get_scripts()
 
-        if not files:
+        if not scripts:
             raise ValueError("No importers matched")
 
+        self.summary = []
         commands_series = []
         commands_parallel = []
         opts = {
             "noclean": False,
             "nochecks": True,
-            "verbosity": 1,
+            "verbosity": kwargs["verbosity"],
             "use_postcode_centroids": False,
+            "diff": kwargs["diff"],
+            "log_events": kwargs["log_events"],
+            "offline": kwargs["offline"],
         }
-        if kwargs["multiprocessing"]:
-            opts = {
-                "noclean": False,
-                "nochecks": True,
-                "verbosity": 0,
-                "use_postcode_centroids": False,
-            }
 
         # loop over all the import scripts
         # and build up a list of management commands to run
-        for f in files:
+        for f, metadata in scripts.items():
             head, tail = os.path.split(f)
-            try:
-                cmd = load_command(f)
-            except:
-                # usually we want to handle a specific exception, but in in this situation
-                # if there is any issue (at all) trying to load the module,
-                # we just want to log it and move on to the next script
-                self.summary.append(("WARNING", "%s could not be loaded!" % tail))
-                continue
-
-            if hasattr(cmd, "elections"):
+            if not metadata["static"]:
+                # The registry couldn't read everything we need from the source
+                # so fall back to loading the script
+                try:
+                    metadata = load_metadata(f)
+                except:
+                    # usually we want to handle a specific exception, but in in this situation
+                    # if there is any issue (at all) trying to load the module,
+                    # we just want to log it and move on to the next script
+                    self.summary.append(("WARNING", "%s could not be loaded!" % tail))
+                    continue
+
+            if "elections" in metadata:
                 if self.importer_covers_these_elections(
-                    kwargs["elections"], cmd.elections, kwargs["regex"]
+                    kwargs["elections"], metadata["elections"], kwargs["regex"]
                 ):
+                    council_id = metadata.get("council_id")
                     # Only run if
                     existing_data = PollingStation.objects.filter(
-                        council_id=cmd.council_id
+                        council_id=council_id
                     ).exists()
                     if not existing_data or kwargs.get("overwrite"):
                         self.summary.append(
-                            ("INFO", f"Ran import script for {cmd.council_id}: {tail}")
+                            ("INFO", f"Ran import script for {council_id}: {tail}")
                         )
-                        if hasattr(cmd, "run_in_series"):
-                            commands_series.append((f, opts))
+                        size = get_input_size(
+                            council_id,
+                            [
+                                metadata.get(name) or ""
+                                for name in [
+                                    "addresses_name",
+                                    "stations_name",
+                                    "districts_name",
+                                ]
+                            ],
+                        )
+                        if metadata["run_in_series"]:
+                            commands_series.append((size, f))
                         else:
-                            commands_parallel.append((f, opts))
+                            commands_parallel.append((size, f))
             else:
                 self.summary.append(
                     ("WARNING", "%s does not contain elections property!" % tail)
                 )
 
+        # start the biggest councils first so they don't hold up the end of the run
+        commands_series = [
+            (f, opts) for size, f in sorted(commands_series, reverse=True)
+        ]
+        commands_parallel = [
+            (f, opts) for size, f in sorted(commands_parallel, reverse=True)
+        ]
+
         print(
             "running %i import scripts..."
             % (len(commands_series) + len(commands_parallel))
@@ -197,14 +352,19 @@ class Command(BaseCommand):
         # run all the import scripts
         if kwargs["multiprocessing"]:
             # do anything we want to run in series first
-            self.run_commands_in_series(commands_series)
+            results = self.run_commands_in_series(commands_series)
 
             # before kicking off parallel imports, close any open
             # DB connections. Otherwise, Django will throw
             # django.db.utils.DatabaseError: lost synchronization with server
             db.connections.close_all()
-            self.run_commands_in_parallel(commands_parallel)
+            results += self.run_commands_in_parallel(
+                commands_parallel, kwargs.get("workers")
+            )
         else:
-            self.run_commands_in_series(commands_parallel + commands_series)
+            results = self.run_commands_in_series(commands_parallel + commands_series)
 
         self.output_summary()
+        failed = self.output_results(results)
+        if failed:
+            raise CommandError("%i import scripts failed" % failed)
@@ -9,14 +9,5 @@ class Command(BaseXpressDemocracyClubCsvImporter):
     csv_delimiter = "\t"
     allow_station_point_from_postcode = False
 
-    def address_record_to_dict(self, record):
-        rec = super().address_record_to_dict(record)
-        uprn = record.property_urn.strip().lstrip("0")
-
-        if uprn == "60031312":
-            rec["postcode"] = "BN15 0RW"
-
-        if record.addressline6 in ["BN41 1PL", "BN15 8LW"]:
-            return None
-
-        return rec
+    uprn_postcode_corrections = {"60031312": "BN15 0RW"}
+    excluded_postcodes = ["BN41 1PL", "BN15 8LW"]
@@ -1,8 +1,6 @@
 """
 Imports Camden
 """
-import tempfile
-import urllib.request
 from fastkml import kml
 from django.contrib.gis.geos import GEOSGeometry, Point
 from data_importers.base_importers import BaseGenericApiImporter, CsvMixin
@@ -40,10 +38,8 @@ class Command(BaseGenericApiImporter, CsvMixin):
         return extended_data
 
     def get_districts(self):
-        with tempfile.NamedTemporaryFile() as tmp:
-            urllib.request.urlretrieve(self.districts_url, tmp.name)
-            data = open(tmp.name, "r").read()
-            return self.parse_kml_features(data)
+        with open(self.download(self.districts_url), "r") as f:
+            return self.parse_kml_features(f.read())
 
     def district_record_to_dict(self, record):
 
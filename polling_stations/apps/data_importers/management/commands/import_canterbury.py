@@ -82,4 +82,4 @@ class Command(BaseGitHubImporter):
                     "council": self.council,
                 }
             )
-        self.stations.save()
+        self.save_set("Stations", self.stations)
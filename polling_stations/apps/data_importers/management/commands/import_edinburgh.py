@@ -1,5 +1,3 @@
-import tempfile
-import urllib.request
 from data_importers.github_importer import BaseGitHubImporter
 
 
@@ -12,27 +10,27 @@ class Command(BaseGitHubImporter):
     geom_type = "geojson"
 
     def get_stations(self):
-        with tempfile.NamedTemporaryFile() as tmp:
-            urllib.request.urlretrieve(self.stations_url, tmp.name)
-            stations = self.get_data(self.stations_filetype, tmp.name)
-            # ad-hoc fixes for parl.2019-12-12
-            stations.append(
-                {
-                    "Polling__1": "Assembly Rooms",
-                    "Address_1": "54 George Street",
-                    "geometry": '{ "type": "Feature", "geometry": null }',
-                    "LG_PP": "NC11A",
-                }
-            )
-            stations.append(
-                {
-                    "Polling__1": "Dalmeny Parish Church Hall",
-                    "Address_1": "Main Street",
-                    "geometry": '{ "type": "Feature", "geometry": null }',
-                    "LG_PP": "WW01C",
-                }
-            )
-            return stations
+        stations = self.get_data(
+            self.stations_filetype, self.download(self.stations_url)
+        )
+        # ad-hoc fixes for parl.2019-12-12
+        stations.append(
+            {
+                "Polling__1": "Assembly Rooms",
+                "Address_1": "54 George Street",
+                "geometry": '{ "type": "Feature", "geometry": null }',
+                "LG_PP": "NC11A",
+            }
+        )
+        stations.append(
+            {
+                "Polling__1": "Dalmeny Parish Church Hall",
+                "Address_1": "Main Street",
+                "geometry": '{ "type": "Feature", "geometry": null }',
+                "LG_PP": "WW01C",
+            }
+        )
+        return stations
 
     def district_record_to_dict(self, record):
         poly = self.extract_geometry(record, self.geom_type, self.get_srid("districts"))
@@ -12,7 +12,7 @@ class Command(BaseGitHubImporter):
     scraper_name = "wdiv-scrapers/DC-PollingStations-Guildford"
     geom_type = "gml"
 
-    def replace_schema(self, record):
+    def clean_gml(self, gml):
         """
         Shoddy workaround for:
         Failed to connect to www2.guildford.gov.uk port 80: Connection timed out
@@ -20,18 +20,17 @@ class Command(BaseGitHubImporter):
         This is *definitely* not the correct way to do this
         but it gets the job done
         """
-        record["geometry"] = record["geometry"].replace(
+        gml = gml.replace(
             "http://www2.guildford.gov.uk/ishare5.2.web/getows.ashx?mapsource=GBC/Inspire&amp;service=WFS&amp;SERVICE=WFS&amp;VERSION=1.1.0&amp;REQUEST=DescribeFeatureType&amp;TYPENAME=polling_districts&amp;OUTPUTFORMAT=XMLSCHEMA",
             "",
         )
-        record["geometry"] = record["geometry"].replace(
+        gml = gml.replace(
             "http://www2.guildford.gov.uk/ishare5.2.web/getows.ashx?mapsource=GBC/Inspire&amp;service=WFS&amp;SERVICE=WFS&amp;VERSION=1.1.0&amp;REQUEST=DescribeFeatureType&amp;TYPENAME=polling_places&amp;OUTPUTFORMAT=XMLSCHEMA",
             "",
         )
-        return record
+        return gml
 
     def district_record_to_dict(self, record):
-        record = self.replace_schema(record)
         poly = self.extract_geometry(record, self.geom_type, self.get_srid("districts"))
         return {
             "internal_council_id": record["register"],
@@ -41,7 +40,6 @@ class Command(BaseGitHubImporter):
         }
 
     def station_record_to_dict(self, record):
-        record = self.replace_schema(record)
         location = self.extract_geometry(
             record, self.geom_type, self.get_srid("stations")
         )
@@ -1,5 +1,3 @@
-import tempfile
-import urllib.request
 from data_importers.github_importer import BaseGitHubImporter
 from data_importers.slugger import Slugger
 
@@ -29,11 +27,9 @@ class Command(BaseGitHubImporter):
 
     def pre_import(self):
         filename = self.base_url % (self.council_id, "stations", "json")
-        with tempfile.NamedTemporaryFile() as tmp:
-            urllib.request.urlretrieve(filename, tmp.name)
-            stations = self.get_data("json", tmp.name)
-            for station in stations:
-                self.station_points[Slugger.slugify(station["place"])] = station
+        stations = self.get_data("json", self.download(filename))
+        for station in stations:
+            self.station_points[Slugger.slugify(station["place"])] = station
 
     def district_record_to_dict(self, record):
         poly = self.extract_geometry(record, self.geom_type, self.get_srid("districts"))
@@ -0,0 +1,58 @@
+import csv
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from councils.models import Council
+from data_importers.contexthelpers import get_dwellings_from_nomis
+from data_importers.models import CensusDwellings
+
+"""
+Load the number of dwellings in each local authority from the 2011 census
+so importers can report it as context without calling the nomis API.
+"""
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--csv",
+            help=(
+                "Load counts from a CSV with the columns 'gss_code' and "
+                "'dwellings' instead of querying nomis for each council"
+            ),
+            default=None,
+        )
+
+    def get_counts_from_csv(self, path):
+        with open(path, "rt") as f:
+            for row in csv.DictReader(f):
+                yield row["gss_code"].strip(), int(row["dwellings"])
+
+    def get_counts_from_nomis(self):
+        gss_codes = set()
+        for identifiers in Council.objects.values_list("identifiers", flat=True):
+            gss_codes.update(identifiers or [])
+
+        for gss_code in sorted(gss_codes):
+            dwellings = get_dwellings_from_nomis(gss_code)
+            # nomis gives us 0 if it doesn't know the code
+            # (e.g: a council created since 2011)
+            if dwellings:
+                yield gss_code, dwellings
+
+    def handle(self, *args, **kwargs):
+        if kwargs["csv"]:
+            counts = self.get_counts_from_csv(kwargs["csv"])
+        else:
+            counts = self.get_counts_from_nomis()
+
+        records = [
+            CensusDwellings(gss_code=gss_code, dwellings=dwellings)
+            for gss_code, dwellings in counts
+        ]
+        with transaction.atomic():
+            CensusDwellings.objects.all().delete()
+            CensusDwellings.objects.bulk_create(records)
+
+        self.stdout.write("Loaded census dwellings for %i areas" % len(records))
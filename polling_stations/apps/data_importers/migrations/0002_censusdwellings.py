@@ -0,0 +1,23 @@
+# Generated by Django 2.2.17 on 2021-01-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_importers", "0001_data_quality_report"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CensusDwellings",
+            fields=[
+                (
+                    "gss_code",
+                    models.CharField(max_length=9, primary_key=True, serialize=False),
+                ),
+                ("dwellings", models.IntegerField()),
+            ],
+        ),
+    ]
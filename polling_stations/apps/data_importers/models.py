@@ -21,6 +21,18 @@ class DataQuality(models.Model):
     num_addresses = models.IntegerField(default=0)
 
 
+class CensusDwellings(models.Model):
+    """
+    Dwellings in each local authority from the 2011 census
+    ('KS401EW - Dwellings, household spaces and accommodation type').
+    Loaded once with load_census_dwellings, so we don't have to ask
+    nomis every time we import a council.
+    """
+
+    gss_code = models.CharField(primary_key=True, max_length=9)
+    dwellings = models.IntegerField()
+
+
 from django.db.models.signals import post_save
 
 
@@ -0,0 +1,141 @@
+"""
+Static registry of import scripts
+
+To decide which import scripts to run, we only need a few class attributes
+from each script (council_id, elections, etc). Rather than executing every
+import_*.py module (and all the Django base classes they pull in) we read
+them from the source with the ast module and cache the result keyed on
+each file's mtime, so the registry only re-parses scripts which have changed.
+"""
+import ast
+import glob
+import json
+import os
+
+
+# class attributes we try to read from each import script
+STATIC_ATTRIBUTES = [
+    "council_id",
+    "elections",
+    "run_in_series",
+    "addresses_name",
+    "stations_name",
+    "districts_name",
+]
+
+# the registry can't answer for a script unless it finds these
+REQUIRED_ATTRIBUTES = ["council_id", "elections"]
+
+CACHE_VERSION = 1
+
+
+class ImportScriptParseError(Exception):
+    """Couldn't read an import script with the ast module"""
+
+    pass
+
+
+def parse_import_script(path):
+    """
+    Read the literal class attributes defined on the Command class in path.
+
+    Returns a dict with a key for each attribute in STATIC_ATTRIBUTES we
+    found a literal value for and a key 'static', which tells us if we found
+    everything in REQUIRED_ATTRIBUTES. If it is False, the only way to find
+    out about this script is to load it.
+    """
+    try:
+        with open(path, "rt", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (SyntaxError, UnicodeDecodeError, ValueError) as e:
+        raise ImportScriptParseError(str(e))
+
+    metadata = {}
+    for node in tree.body:
+        if not (isinstance(node, ast.ClassDef) and node.name == "Command"):
+            continue
+        for stmt in node.body:
+            if not isinstance(stmt, ast.Assign) or len(stmt.targets) != 1:
+                continue
+            target = stmt.targets[0]
+            if not isinstance(target, ast.Name) or target.id not in STATIC_ATTRIBUTES:
+                continue
+            if target.id == "run_in_series":
+                # import only checks hasattr(cmd, "run_in_series")
+                metadata["run_in_series"] = True
+                continue
+            try:
+                metadata[target.id] = ast.literal_eval(stmt.value)
+            except ValueError:
+                # not a literal (e.g: a property or computed value)
+                # so we can't know this without loading the script
+                metadata.pop(target.id, None)
+
+    metadata["static"] = all(attr in metadata for attr in REQUIRED_ATTRIBUTES)
+    metadata.setdefault("run_in_series", False)
+    return metadata
+
+
+class ImporterRegistry:
+    def __init__(self, path, cache_path=None):
+        self.path = path
+        self.cache_path = cache_path
+
+    def get_script_paths(self):
+        return sorted(glob.glob(os.path.join(self.path, "import_*.py")))
+
+    def read_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "rt") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("scripts", {})
+
+    def write_cache(self, scripts):
+        if not self.cache_path:
+            return
+        # write to a temp file and rename it so concurrent
+        # readers never see a partially written cache
+        tmp_path = "%s.%i.tmp" % (self.cache_path, os.getpid())
+        try:
+            with open(tmp_path, "wt") as f:
+                json.dump({"version": CACHE_VERSION, "scripts": scripts}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # the cache is only an optimisation
+            pass
+
+    def get_scripts(self):
+        """
+        Returns a dict of path -> metadata for every import script.
+
+        If a script couldn't be parsed, its metadata has a key 'error'.
+        """
+        cache = self.read_cache()
+        scripts = {}
+        changed = False
+
+        for path in self.get_script_paths():
+            mtime = os.path.getmtime(path)
+            cached = cache.get(path)
+            if cached and cached["mtime"] == mtime:
+                scripts[path] = cached
+                continue
+
+            try:
+                metadata = parse_import_script(path)
+            except ImportScriptParseError as e:
+                metadata = {"static": False, "error": str(e)}
+            metadata["mtime"] = mtime
+            scripts[path] = metadata
+            changed = True
+
+        if changed or set(cache) != set(scripts):
+            self.write_cache(scripts)
+
+        return scripts
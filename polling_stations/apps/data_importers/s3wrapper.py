@@ -1,65 +1,180 @@
-import glob
+import fcntl
 import os
+import re
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
 from boto.pyami.config import Config
-from boto.s3.connection import S3Connection
 from django.conf import settings
 
 
+"""
+Local cache of the data in our S3 bucket
+
+Files are downloaded once into a content-addressed object store
+(s3cache/.objects/<etag>-<size>) and hard linked to their key
+(e.g: s3cache/X01000001-Foo/data.csv) where the importers expect to
+find them. When we fetch a prefix again, anything whose ETag and size
+still match an object we've already got is just re-linked, so we only
+download files which have changed since last time.
+
+Several importers can share a cache: downloads and links are written
+to temp files and moved into place atomically, and fetches for the
+same prefix are serialised with a lock file. Objects which no key
+links to any more are deleted when nobody else is using the store.
+"""
+
+
+def get_s3_client():
+    config = Config()
+    access_key = config.get_value(settings.BOTO_SECTION, "aws_access_key_id")
+    secret_key = config.get_value(settings.BOTO_SECTION, "aws_secret_access_key")
+    return boto3.client(
+        "s3", aws_access_key_id=access_key, aws_secret_access_key=secret_key
+    )
+
+
 class S3Wrapper:
-    def __init__(self):
-        config = Config()
-        access_key = config.get_value(settings.BOTO_SECTION, "aws_access_key_id")
-        secret_key = config.get_value(settings.BOTO_SECTION, "aws_secret_access_key")
+    max_workers = 8
 
-        # connect to S3 + get ref to our data bucket
-        conn = S3Connection(access_key, secret_key)
-        self.bucket = conn.get_bucket(settings.S3_DATA_BUCKET)
+    def __init__(self, client=None, base_path="./s3cache/"):
+        self.client = client or get_s3_client()
+        self.bucket = settings.S3_DATA_BUCKET
 
         # this is where our local data will live
-        self.base_path = os.path.abspath("./s3cache/")
+        self.base_path = os.path.abspath(base_path)
+        self.objects_path = os.path.join(self.base_path, ".objects")
+        self.locks_path = os.path.join(self.base_path, ".locks")
+        self.objects_lock_path = os.path.join(self.locks_path, ".objects.lock")
 
     @property
     def data_path(self):
         return os.path.abspath(self.base_path)
 
-    def fetch_data(self, prefix):
-        local_pattern = os.path.abspath("%s/%s*" % (self.base_path, prefix))
-        local_paths = glob.glob(local_pattern)
-
-        if len(local_paths) == 1:
-            # if local dir already exists, delete it to
-            # remove any existing (potentially stale) data
-            shutil.rmtree(local_paths[0])
-        elif len(local_paths) > 1:
-            raise ValueError(
-                "Pattern '%s' matched more than one directory" % local_pattern
-            )
-        else:
-            # if local dir does not exist, no worries. We will create
-            # any necessary directories when we pull data down from s3
-            pass
-
-        # fetch data for this prefix
-        keys = self.bucket.list(prefix=prefix)
-        count = 0
-        for key in keys:
-
-            # ignore directories
-            if key.key[-8:] == "$folder$" or key.key[-1] == "/":
+    def get_tmp_path(self, path):
+        return "%s.%i.%i.tmp" % (path, os.getpid(), threading.get_ident())
+
+    def get_object_path(self, obj):
+        etag = re.sub(r"[^0-9A-Za-z-]", "", obj["ETag"])
+        return os.path.join(self.objects_path, "%s-%i" % (etag, obj["Size"]))
+
+    def list_objects(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                # ignore directories
+                if obj["Key"].endswith("$folder$") or obj["Key"].endswith("/"):
+                    continue
+                yield obj
+
+    def download_object(self, obj):
+        """
+        Make sure we've got a copy of obj in the object store.
+        Returns True if we had to download it.
+        """
+        object_path = self.get_object_path(obj)
+        if os.path.exists(object_path):
+            return False
+
+        tmp_path = self.get_tmp_path(object_path)
+        try:
+            self.client.download_file(self.bucket, obj["Key"], tmp_path)
+            os.replace(tmp_path, object_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return True
+
+    def link_object(self, obj):
+        object_path = self.get_object_path(obj)
+        local_file = os.path.join(self.base_path, obj["Key"])
+        if os.path.exists(local_file) and os.path.samefile(object_path, local_file):
+            return
+
+        os.makedirs(os.path.dirname(local_file), exist_ok=True)
+        tmp_path = self.get_tmp_path(local_file)
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            # e.g: the filesystem doesn't support hard links
+            shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, local_file)
+
+    def fetch_object(self, obj):
+        downloaded = self.download_object(obj)
+        self.link_object(obj)
+        return downloaded
+
+    def remove_stale_files(self, prefix, keys):
+        """
+        Delete any local files for this prefix which aren't in S3 any more
+        """
+        # keys under prefix are in the directory it's in, and start with
+        # the rest of it: e.g. X01000001 matches X01000001-Foo/data.csv
+        head, tail = os.path.split(prefix)
+        root = os.path.join(self.base_path, head)
+        if not os.path.isdir(root):
+            return
+
+        local_files = set()
+        for entry in os.scandir(root):
+            if not entry.name.startswith(tail) or entry.name in (".objects", ".locks"):
+                continue
+            if not entry.is_dir():
+                local_files.add(entry.path)
                 continue
+            for dirpath, dirnames, filenames in os.walk(entry.path):
+                for filename in filenames:
+                    local_files.add(os.path.join(dirpath, filename))
+
+        for path in local_files:
+            if os.path.relpath(path, self.base_path) not in keys:
+                os.remove(path)
+
+    def remove_unused_objects(self):
+        """
+        Delete objects which aren't linked to any key. If another fetch
+        is using the object store, leave them for the next one.
+        """
+        with open(self.objects_lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            for entry in os.scandir(self.objects_path):
+                if entry.stat().st_nlink == 1:
+                    os.remove(entry.path)
+
+    def fetch_data(self, prefix):
+        """
+        Sync the local cache with the objects in S3 under prefix.
+        Returns a tuple of (files downloaded, files we already had)
+        """
+        os.makedirs(self.objects_path, exist_ok=True)
+        os.makedirs(self.locks_path, exist_ok=True)
+
+        lock_path = os.path.join(self.locks_path, "%s.lock" % prefix.replace("/", "_"))
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            objects = list(self.list_objects(prefix))
+            if not objects:
+                raise ValueError("Couldn't find any data to import")
+
+            # objects we've downloaded aren't linked to a key until
+            # fetch_object() returns, so hold off remove_unused_objects()
+            with open(self.objects_lock_path, "w") as objects_lock:
+                fcntl.flock(objects_lock, fcntl.LOCK_SH)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    downloaded = sum(executor.map(self.fetch_object, objects))
 
-            local_file = os.path.join(self.base_path, key.key)
-            os.makedirs(os.path.dirname(local_file), exist_ok=True)
-            key.get_contents_to_filename(local_file)
-            # We have to manually build a count of the number of items:
-            # A BucketListResultSet does not have a len() because it is
-            # a generator expression, not a list
-            count = count + 1
+            self.remove_stale_files(prefix, {obj["Key"] for obj in objects})
+            self.remove_unused_objects()
 
-        if count == 0:
-            raise ValueError("Couldn't find any data to import")
+        return downloaded, len(objects) - downloaded
 
     def fetch_data_by_council(self, council_id):
         prefix = "%s" % (council_id)
-        self.fetch_data(prefix)
+        return self.fetch_data(prefix)
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from councils.models import Council
 from data_importers.data_types import AddressList
 
 
@@ -63,6 +64,26 @@ class AddressListTest(TestCase):
 
         self.assertEqual(expected, address_list.elements)
 
+    def test_append_stores_council_id(self):
+        council = Council.objects.create(pk="AAA")
+        address_list = AddressList(MockLogger())
+        address_list.append(
+            {
+                "address": "foo",
+                "postcode": "AA11AA",
+                "council": council,
+                "polling_station_id": "01",
+                "uprn": "1",
+            }
+        )
+
+        record = address_list.elements[0]
+        self.assertEqual("AAA", record["council"])
+        self.assertEqual("AAA", address_list.council_id)
+        self.assertEqual("01", record.polling_station_id)
+        with self.assertRaises(AttributeError):
+            record.foo = "bar"
+
     def test_get_uprn_lookup(self):
         in_list = [
             {
@@ -319,5 +340,68 @@ class AddressListTest(TestCase):
         address_list.remove_records_that_dont_match_addressbase(addressbase_data)
         self.assertEqual(expected, address_list.elements)
 
+    def test_reconcile(self):
+        in_list = [
+            {
+                "polling_station_id": "01",
+                "address": "foo 1",
+                "postcode": "AA1 2BB",
+                "council": "AAA",
+                "uprn": "1",
+            },
+            {
+                "polling_station_id": "01",
+                "address": "foo 2",
+                "postcode": "aa12cc",
+                "council": "AAA",
+                "uprn": "2",
+            },
+            {
+                "polling_station_id": "01",
+                "address": "foo 3",
+                "postcode": "AA1 2BB",
+                "council": "AAA",
+                "uprn": "3",
+            },
+            {
+                "polling_station_id": "01",
+                "address": "foo 4",
+                "postcode": "AA1 2BB",
+                "council": "AAA",
+                "uprn": "4",
+            },
+            {
+                "polling_station_id": "02",
+                "address": "foo 4",
+                "postcode": "AA1 2BB",
+                "council": "AAA",
+                "uprn": "4",
+            },
+            {
+                "polling_station_id": "01",
+                "address": "foo 5",
+                "postcode": "AA1 2BB",
+                "council": "AAA",
+                "uprn": "5",
+            },
+        ]
+        addressbase_postcodes = {
+            "1": "AA12BB",
+            "2": "AA12CC",
+            "4": "AA12BB",
+            "5": "AA12CC",
+        }
+
+        address_list = AddressList(MockLogger())
+        for el in in_list:
+            address_list.append(el)
+
+        rejected = address_list.reconcile(addressbase_postcodes)
+        self.assertEqual(["1", "2"], [e["uprn"] for e in address_list.elements])
+        self.assertEqual(
+            {"duplicate_uprn": 2, "not_in_addressbase": 1, "postcode_mismatch": 1},
+            rejected,
+        )
+
     def test_check_records(self):
         pass
@@ -0,0 +1,38 @@
+import mock
+from django.test import TestCase
+
+from data_importers.loghelper import LogHelper
+from data_importers.tests.stubs import stub_xpress_democlub
+
+
+class OverridesImporter(stub_xpress_democlub.Command):
+    excluded_uprns = ["0002"]
+    excluded_postcodes = ["BN15 8DA"]
+    uprn_postcode_corrections = {"1": "BN15 9ZZ", 4: "BN15 8ZZ"}
+    station_id_remaps = {"518": "519"}
+
+
+class AddressOverridesTest(TestCase):
+    def get_addresses(self):
+        cmd = OverridesImporter()
+        cmd.validation_checks = False
+        cmd.verbosity = 0
+        cmd.logger = LogHelper(0)
+        addresses = []
+        with mock.patch.object(cmd, "add_residential_address", addresses.append):
+            cmd.import_residential_addresses()
+        return addresses
+
+    def test_overrides(self):
+        addresses = self.get_addresses()
+        # 2 is excluded by UPRN, 3 has no postcode,
+        # 4 and 5 are excluded by (their original) postcode
+        self.assertEqual(["1"], [address["uprn"] for address in addresses])
+        self.assertEqual("BN15 9ZZ", addresses[0]["postcode"])
+        self.assertEqual("519", addresses[0]["polling_station_id"])
+
+    def test_no_overrides(self):
+        cmd = stub_xpress_democlub.Command()
+        address = {"uprn": "1", "postcode": "BN15 9DH", "polling_station_id": "518"}
+        self.assertEqual(dict(address), cmd.apply_address_overrides(address))
+        self.assertIsNone(cmd.apply_address_overrides(None))
@@ -34,3 +34,16 @@ class AssignPollingStationsMixinTest(TestCase):
 
         self.assertEqual(UprnToCouncil.objects.get(pk="001").polling_station_id, "1")
         self.assertEqual(UprnToCouncil.objects.get(pk="002").polling_station_id, "")
+
+    def test_update_uprn_to_council_model_other_council(self):
+        Council.objects.update_or_create(pk="Foo")
+        Council.objects.update_or_create(pk="Bar")
+        Address.objects.update_or_create(pk="001")
+        UprnToCouncil.objects.update_or_create(pk="001", lad="Bar")
+        mock_collection = MockCollection()
+        mock_collection.elements = [{"council": Council.objects.get(pk="Foo")}]
+        updated = mock_collection.update_uprn_to_council_model()
+
+        # UPRNs in a different council are never assigned a station
+        self.assertEqual(updated, 0)
+        self.assertEqual(UprnToCouncil.objects.get(pk="001").polling_station_id, "")
@@ -0,0 +1,44 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from addressbase.models import (
+    Address,
+    CouncilUprnCount,
+    UprnToCouncil,
+    update_council_uprn_counts,
+)
+from data_importers.contexthelpers import Dwellings
+
+
+class DwellingsTest(TestCase):
+    def setUp(self):
+        for uprn, lad in [("1", "AAA"), ("2", "AAA"), ("3", "BBB")]:
+            Address.objects.create(uprn=uprn, address="foo", postcode="AA1 1AA")
+            UprnToCouncil.objects.create(uprn_id=uprn, lad=lad)
+
+    def test_from_census(self):
+        self.assertIsNone(Dwellings().from_census("X01000001"))
+
+        with tempfile.NamedTemporaryFile("wt", suffix=".csv") as f:
+            f.write("gss_code,dwellings\nX01000001,1234\nX01000002,5678\n")
+            f.flush()
+            call_command("load_census_dwellings", csv=f.name, stdout=StringIO())
+
+        self.assertEqual(1234, Dwellings().from_census("X01000001"))
+        self.assertIsNone(Dwellings().from_census("X01000003"))
+
+    def test_from_addressbase(self):
+        # before we've counted, fall back to counting UprnToCouncil
+        self.assertEqual(2, Dwellings().from_addressbase("AAA"))
+        self.assertFalse(CouncilUprnCount.objects.exists())
+
+        with connection.cursor() as cursor:
+            update_council_uprn_counts(cursor)
+
+        self.assertEqual(2, CouncilUprnCount.objects.get(lad="AAA").count)
+        with self.assertNumQueries(1):
+            self.assertEqual(1, Dwellings().from_addressbase("BBB"))
@@ -21,3 +21,24 @@ class CsvHelperTest(TestCase):
         self.assertEqual("", data[1].baz)
 
         self.assertNotIn(2, data)
+
+    def test_parse_csv_stream(self):
+        helper = CsvHelper(
+            os.path.join(os.path.dirname(__file__), "fixtures/csv_helper/test.csv"),
+            stream=True,
+        )
+        data = helper.get_features()
+
+        self.assertEqual(2, len(data))
+
+        rows = list(data)
+        self.assertEqual(2, len(rows))
+        self.assertEqual("1", rows[0].foo)
+        self.assertEqual("2", rows[0].b_a_r)
+        self.assertEqual("3", rows[0].baz)
+        self.assertEqual("cheese", rows[1].foo)
+        self.assertEqual("peas", rows[1].b_a_r)
+        self.assertEqual("", rows[1].baz)
+
+        # we can iterate over the same data more than once
+        self.assertEqual(rows, list(data))
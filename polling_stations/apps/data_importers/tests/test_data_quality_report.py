@@ -0,0 +1,113 @@
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.test import TestCase
+
+from addressbase.models import Address, UprnToCouncil
+from councils.models import Council
+from data_importers.data_quality_report import (
+    DataQualityReport,
+    DataQualityReportBuilder,
+)
+from pollingstations.models import PollingDistrict, PollingStation
+
+
+def square(x, y):
+    return MultiPolygon(
+        Polygon(((x, y), (x, y + 1), (x + 1, y + 1), (x + 1, y), (x, y))),
+        srid=4326,
+    )
+
+
+class DataQualityReportTest(TestCase):
+    def setUp(self):
+        Council.objects.update_or_create(pk="AAA")
+        Council.objects.update_or_create(pk="BBB")
+
+        PollingDistrict.objects.create(
+            council_id="AAA",
+            internal_council_id="A",
+            polling_station_id="PS-1",
+            area=square(0, 0),
+        )
+        PollingDistrict.objects.create(
+            council_id="AAA",
+            internal_council_id="B",
+            polling_station_id="PS-X",
+            area=square(1, 0),
+        )
+        PollingDistrict.objects.create(
+            council_id="AAA", internal_council_id="C", area=square(5, 5)
+        )
+        # another council's district over the same area
+        # shouldn't count towards AAA's polygon lookups
+        PollingDistrict.objects.create(
+            council_id="BBB", internal_council_id="A", area=square(0, 0)
+        )
+
+        PollingStation.objects.create(
+            council_id="AAA",
+            internal_council_id="PS-1",
+            polling_district_id="A",
+            address="Foo Hall",
+            location=Point(0.5, 0.5, srid=4326),
+        )
+        PollingStation.objects.create(
+            council_id="AAA",
+            internal_council_id="PS-2",
+            polling_district_id="Z",
+            address="Bar Hall",
+            location=Point(0.25, 0.25, srid=4326),
+        )
+        PollingStation.objects.create(
+            council_id="AAA", internal_council_id="PS-3", address=""
+        )
+
+        for uprn, station_id in [("1", "PS-1"), ("2", "PS-9"), ("3", "")]:
+            Address.objects.create(uprn=uprn, address="foo", postcode="AA1 1AA")
+            UprnToCouncil.objects.create(
+                uprn_id=uprn, lad="AAA", polling_station_id=station_id
+            )
+
+    def test_counts(self):
+        with self.assertNumQueries(1):
+            report = DataQualityReport("AAA")
+
+        self.assertEqual(
+            {
+                "stations_imported": 3,
+                "stations_with_district_id": 2,
+                "stations_without_district_id": 1,
+                "stations_with_valid_district_id_ref": 1,
+                "stations_with_invalid_district_id_ref": 1,
+                "stations_with_point": 2,
+                "stations_without_point": 1,
+                "stations_with_address": 2,
+                "stations_without_address": 1,
+                "stations_in_zero_districts": 0,
+                "stations_in_one_districts": 2,
+                "stations_in_more_districts": 0,
+                "districts_imported": 3,
+                "districts_with_station_id": 2,
+                "districts_without_station_id": 1,
+                "districts_with_valid_station_id_ref": 1,
+                "districts_with_invalid_station_id_ref": 1,
+                "districts_containing_zero_stations": 2,
+                "districts_containing_one_stations": 0,
+                "districts_containing_more_stations": 1,
+                "uprns_in_addressbase": 3,
+                "addresses_with_station_id": 2,
+                "addresses_without_station_id": 1,
+                "addresses_with_valid_station_id_ref": 1,
+                "addresses_with_invalid_station_id_ref": 1,
+            },
+            report.counts,
+        )
+
+    def test_string_report(self):
+        builder = DataQualityReportBuilder("AAA")
+        builder.build_report()
+        report = builder.generate_string_report()
+
+        self.assertIn("STATIONS IMPORTED                : 3", report)
+        self.assertIn("DISTRICTS IMPORTED               : 3", report)
+        self.assertIn("Districts containing >1 stations : 1", report)
+        self.assertIn("UPRNS ASSIGNED STATION ID        : 2", report)
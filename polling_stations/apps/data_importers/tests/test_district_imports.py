@@ -64,6 +64,79 @@ class ImporterTest(TestCase):
 
         self.assertTrue(exception_thrown)
 
+    def test_failed_import_keeps_existing_data(self):
+        """
+        We only delete the old data in the same transaction that writes
+        the new data, so if an import fails we still have the old data
+        """
+        self.create_dummy_council()
+        PollingStation.objects.create(
+            council=Council.objects.get(pk="AAA"), internal_council_id="OLD"
+        )
+        cmd = stub_duplicatestation.Command()
+        with self.assertRaises(IntegrityError):
+            cmd.handle(**self.opts)
+
+        self.assertListEqual(
+            ["OLD"],
+            list(
+                PollingStation.objects.filter(council_id="AAA").values_list(
+                    "internal_council_id", flat=True
+                )
+            ),
+        )
+
+    def test_failed_post_import_keeps_existing_data(self):
+        """
+        post_import() runs in the same transaction as the import
+        """
+
+        class Command(stub_specialcases.Command):
+            def post_import(self):
+                raise IntegrityError
+
+        self.create_dummy_council()
+        PollingStation.objects.create(
+            council=Council.objects.get(pk="AAA"), internal_council_id="OLD"
+        )
+        with self.assertRaises(IntegrityError):
+            Command().handle(**self.opts)
+
+        self.assertListEqual(
+            ["OLD"],
+            list(
+                PollingStation.objects.filter(council_id="AAA").values_list(
+                    "internal_council_id", flat=True
+                )
+            ),
+        )
+
+    def test_diff_with_post_import(self):
+        """
+        Importers with a post_import() step always import in full
+        """
+
+        class Command(stub_specialcases.Command):
+            def post_import(self):
+                PollingStation.objects.filter(council_id="AAA").update(
+                    postcode="AA1 1AA"
+                )
+
+        self.create_dummy_council()
+        for _ in range(2):
+            cmd = Command()
+            cmd.handle(diff=True, **self.opts)
+            self.assertFalse(cmd.diff)
+
+        self.assertListEqual(
+            [("AA", "AA1 1AA"), ("AB", "AA1 1AA")],
+            list(
+                PollingStation.objects.filter(council_id="AAA")
+                .order_by("internal_council_id")
+                .values_list("internal_council_id", "postcode")
+            ),
+        )
+
     def test_duplicate_districts(self):
         """
         Check that if we try to insert a duplicate district on
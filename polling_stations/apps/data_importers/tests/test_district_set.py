@@ -14,129 +14,24 @@ class DistrictSetTest(TestCase):
     def tearDown(self):
         PollingDistrict.objects.all().delete()
 
-    def test_get_polling_station_lookup(self):
-        """
-        Not to scale...
-
-        4├         ┌╶ ╴┐
-        3├         ┊   ┊
-        2├ ┌╶ ╴┐   └╶ ╴┘
-        1├ ┊*  ┊   *
-        0├ └╶ ╴┘
-         └ ┴ ─ ┴ ─ ┴ ─ ┴
-           0   1   2   3
-        """
-
-        polling_districts = [
-            {
-                "polling_station_id": "01",
-                "area": MultiPolygon(Polygon(((0, 0), (0, 2), (1, 2), (1, 0), (0, 0)))),
-                "council": Council.objects.get(pk="AAA"),
-                "internal_council_id": "A",
-            },
-            {
-                "polling_station_id": "02",
-                "area": MultiPolygon(Polygon(((2, 2), (2, 4), (3, 4), (3, 2), (2, 2)))),
-                "council": Council.objects.get(pk="AAA"),
-                "internal_council_id": "B",
-            },
-        ]
-        addressbase = [
-            {
-                "uprn": "1",
-                "location": Point(0.25, 1),
-            },
-            {
-                "uprn": "2",
-                "location": Point(2, 1),
-            },
-        ]
-        uprns = [
-            "1",
-            "2",
-        ]
-
-        for address in addressbase:
-            Address.objects.update_or_create(**address)
-
-        for uprn in uprns:
-            UprnToCouncil.objects.update_or_create(pk=uprn, lad="AAA")
-
-        district_set = DistrictSet()
-        for element in polling_districts:
-            district_set.add(element)
-        district_set.save()
-
-        expected = {"01": {"1"}}
-        self.assertEqual(district_set.get_polling_station_lookup(), expected)
-
-    def test_get_polling_station_lookup_uprn_in_districts_overlap(self):
-        """
-        Not to scale...
-
-        4├    ┌╴╴╴╴┐
-        3├ ┌╴╴┼ ┐ *┊
-        2├ ┊  ┊*┊  ┊
-        1├ ┊* └╴┼╴╴┘
-        0├ └╴╴╴╴┘
-         └ ┴ ─ ┴ ─ ┴ ─ ┴
-           0   1   2   3
-
-        Shows the case where a uprn is in a section of two overlapping districts.
-        This can happen as a result of poor digitisation/generalisation errors, but should not
-        affect many addresses. We should assign the UPRN to both polling stations, which should then
-        be caught by the update_uprn_to_council_model.
-        """
-
-        polling_districts = [
-            {
-                "polling_station_id": "01",
-                "area": MultiPolygon(
-                    Polygon(((0, 0), (0, 3), (1.25, 3), (1.25, 0), (0, 0)))
-                ),
-                "council": Council.objects.get(pk="AAA"),
-                "internal_council_id": "A",
-            },
-            {
-                "polling_station_id": "02",
-                "area": MultiPolygon(
-                    Polygon(((0.75, 1), (0.75, 4), (2, 4), (2, 1), (0.75, 1)))
-                ),
-                "council": Council.objects.get(pk="AAA"),
-                "internal_council_id": "B",
-            },
-        ]
-        addressbase = [
-            {
-                "uprn": "1",
-                "location": Point(0.25, 1),
-            },
-            {
-                "uprn": "2",
-                "location": Point(1, 2),
-            },
-            {
-                "uprn": "3",
-                "location": Point(1.75, 3),
-            },
-        ]
-        uprns = ["1", "2", "3"]
-
-        for address in addressbase:
-            Address.objects.update_or_create(**address)
-
-        for uprn in uprns:
-            UprnToCouncil.objects.update_or_create(pk=uprn, lad="AAA")
+    def test_save_changes_unchanged_area(self):
         district_set = DistrictSet()
-        for element in polling_districts:
-            district_set.add(element)
+        for internal_council_id in ["A", "B"]:
+            district_set.add(
+                {
+                    "polling_station_id": "01",
+                    "area": MultiPolygon(
+                        Polygon(((0, 0), (0, 2), (1, 2), (1, 0), (0, 0))), srid=4326
+                    ),
+                    "council": Council.objects.get(pk="AAA"),
+                    "internal_council_id": internal_council_id,
+                }
+            )
         district_set.save()
 
-        expected = {"01": {"1", "2"}, "02": {"2", "3"}}
+        self.assertEqual((0, 0, 0), district_set.save_changes())
 
-        self.assertEqual(district_set.get_polling_station_lookup(), expected)
-
-    def test_get_polling_station_lookup_uprn_on_district_boundaries(self):
+    def test_update_uprn_to_council_model_uprn_on_district_boundaries(self):
         """
         Not to scale...
 
@@ -208,9 +103,15 @@ class DistrictSetTest(TestCase):
             district_set.add(element)
         district_set.save()
 
-        expected = {"01": {"1", "2"}, "02": {"4"}}
-
-        self.assertEqual(district_set.get_polling_station_lookup(), expected)
+        district_set.update_uprn_to_council_model()
+        updated_uprns = (
+            UprnToCouncil.objects.all()
+            .order_by("uprn")
+            .values_list("uprn", "polling_station_id")
+        )
+        self.assertListEqual(
+            list(updated_uprns), [("1", "01"), ("2", "01"), ("3", ""), ("4", "02")]
+        )
 
     def test_update_uprn_to_council_model(self):
         polling_districts = [
@@ -257,3 +158,76 @@ class DistrictSetTest(TestCase):
         self.assertListEqual(
             list(updated_uprns), [("1", "01"), ("2", ""), ("3", "02"), ("4", "")]
         )
+
+    def test_update_uprn_to_council_model_spatial_join(self):
+        """
+        Not to scale...
+
+        4├    ┌╴╴╴╴┐
+        3├ ┌╴╴┼ ┐ *┊
+        2├ ┊  ┊*┊  ┊
+        1├ ┊* └╴┼╴╴┘
+        0├ └╴╴╴╴┘
+         └ ┴ ─ ┴ ─ ┴ ─ ┴
+           0   1   2   3
+
+        Shows the case where a uprn is in a section of two overlapping districts.
+        This can happen as a result of poor digitisation/generalisation errors, but
+        should not affect many addresses. We can't tell which polling station is
+        right, so the UPRN isn't assigned to either of them.
+        """
+        polling_districts = [
+            {
+                "polling_station_id": "01",
+                "area": MultiPolygon(
+                    Polygon(((0, 0), (0, 3), (1.25, 3), (1.25, 0), (0, 0)))
+                ),
+                "council": Council.objects.get(pk="AAA"),
+                "internal_council_id": "A",
+            },
+            {
+                "polling_station_id": "02",
+                "area": MultiPolygon(
+                    Polygon(((0.75, 1), (0.75, 4), (2, 4), (2, 1), (0.75, 1)))
+                ),
+                "council": Council.objects.get(pk="AAA"),
+                "internal_council_id": "B",
+            },
+        ]
+        addressbase = [
+            {
+                "uprn": "1",
+                "location": Point(0.25, 1),
+            },
+            {
+                "uprn": "2",
+                "location": Point(1, 2),
+            },
+            {
+                "uprn": "3",
+                "location": Point(1.75, 3),
+            },
+            {
+                "uprn": "4",
+                "location": Point(3, 3),
+            },
+        ]
+
+        for address in addressbase:
+            Address.objects.update_or_create(**address)
+            UprnToCouncil.objects.update_or_create(pk=address["uprn"], lad="AAA")
+
+        district_set = DistrictSet()
+        for element in polling_districts:
+            district_set.add(element)
+        district_set.save()
+
+        district_set.update_uprn_to_council_model()
+        updated_uprns = (
+            UprnToCouncil.objects.all()
+            .order_by("uprn")
+            .values_list("uprn", "polling_station_id")
+        )
+        self.assertListEqual(
+            list(updated_uprns), [("1", "01"), ("2", ""), ("3", "02"), ("4", "")]
+        )
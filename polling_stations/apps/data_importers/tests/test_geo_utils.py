@@ -0,0 +1,58 @@
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.test import TestCase
+
+from councils.models import Council
+from data_importers.geo_utils import CouncilAreaIndex
+
+
+class CouncilAreaIndexTest(TestCase):
+    def setUp(self):
+        """
+        Not to scale...
+
+        2├ ┌╶ ╴┬╶ ╴┐
+        1├ ┊ A ┊ B ┊
+        0├ └╶ ╴┴╶ ╴┘
+         └ ┴ ─ ┴ ─ ┴
+           0   1   2
+        """
+        self.index = CouncilAreaIndex(
+            [
+                Council(
+                    council_id="AAA",
+                    area=MultiPolygon(
+                        Polygon(((0, 0), (0, 2), (1, 2), (1, 0), (0, 0))), srid=4326
+                    ),
+                ),
+                Council(
+                    council_id="BBB",
+                    area=MultiPolygon(
+                        Polygon(((1, 0), (1, 2), (2, 2), (2, 0), (1, 0))), srid=4326
+                    ),
+                ),
+                Council(council_id="CCC", area=None),
+            ]
+        )
+
+    def test_len(self):
+        self.assertEqual(2, len(self.index))
+
+    def test_covering(self):
+        self.assertEqual(
+            ["AAA"],
+            [c.council_id for c in self.index.covering(Point(0.5, 1, srid=4326))],
+        )
+        self.assertEqual(
+            ["BBB"],
+            [c.council_id for c in self.index.covering(Point(1.5, 1, srid=4326))],
+        )
+
+    def test_covering_boundary(self):
+        self.assertEqual(
+            ["AAA", "BBB"],
+            [c.council_id for c in self.index.covering(Point(1, 1, srid=4326))],
+        )
+
+    def test_covering_outside(self):
+        self.assertEqual([], self.index.covering(Point(3, 1, srid=4326)))
+        self.assertEqual([], self.index.covering(Point(0.5, 3, srid=4326)))
@@ -0,0 +1,62 @@
+import io
+import json
+import tempfile
+
+from django.test import TestCase
+
+from data_importers.filehelpers import GeoJsonHelper, JsonStream
+
+
+FEATURES = [
+    {
+        "type": "Feature",
+        "properties": {"id": i, "name": "features ]} %i" % i, "area": 1234.5678},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[0, 0], [0, i + 1], [i + 1, i + 1], [0, 0]]],
+        },
+    }
+    for i in range(5)
+]
+COLLECTION = {
+    "type": "FeatureCollection",
+    "crs": {"type": "name", "properties": {"name": "EPSG:27700"}},
+    "features": FEATURES,
+    "bbox": [0, 0, 5, 5],
+}
+
+
+class JsonStreamTest(TestCase):
+    def test_iter_object_member(self):
+        for chunk_size in [1, 3, 1024]:
+            for indent in [None, 2]:
+                stream = JsonStream(
+                    io.StringIO(json.dumps(COLLECTION, indent=indent)), chunk_size
+                )
+                self.assertEqual(FEATURES, list(stream.iter_object_member("features")))
+
+    def test_empty(self):
+        for data in ['{"features": []}', "{}", ' { "type" : "FeatureCollection" } ']:
+            stream = JsonStream(io.StringIO(data), 2)
+            self.assertEqual([], list(stream.iter_object_member("features")))
+
+    def test_truncated(self):
+        data = json.dumps(COLLECTION)[:-20]
+        stream = JsonStream(io.StringIO(data), 16)
+        with self.assertRaises(ValueError):
+            list(stream.iter_object_member("features"))
+
+
+class GeoJsonHelperTest(TestCase):
+    def test_get_features(self):
+        with tempfile.NamedTemporaryFile("wt", suffix=".geojson") as f:
+            json.dump(COLLECTION, f)
+            f.flush()
+            features = GeoJsonHelper(f.name).get_features()
+            self.assertEqual(FEATURES, list(features))
+            self.assertEqual(5, len(features))
+            self.assertEqual(FEATURES, list(features))
+
+            features = GeoJsonHelper(f.name).get_features()
+            self.assertEqual(5, len(features))
+            self.assertEqual(FEATURES, list(features))
@@ -0,0 +1,77 @@
+import mock
+from django.test import TestCase
+
+from data_importers.geo_utils import read_gml_geometries
+from data_importers.github_importer import BaseGitHubImporter
+
+
+GML = """<?xml version="1.0" encoding="utf-8" ?>
+<ogr:FeatureCollection
+    xmlns:ogr="http://ogr.maptools.org/"
+    xmlns:gml="http://www.opengis.net/gml">
+  <gml:featureMember>
+    <ogr:stations fid="stations.0">
+      <ogr:geometryProperty>
+        <gml:Point><gml:coordinates>%s</gml:coordinates></gml:Point>
+      </ogr:geometryProperty>
+      <ogr:code>%s</ogr:code>
+    </ogr:stations>
+  </gml:featureMember>
+</ogr:FeatureCollection>
+"""
+
+
+class Importer(BaseGitHubImporter):
+    council_id = "X01000001"
+    elections = []
+    geom_type = "gml"
+
+    def district_record_to_dict(self, record):
+        pass
+
+    def station_record_to_dict(self, record):
+        pass
+
+
+class GitHubImporterGmlTest(TestCase):
+    def setUp(self):
+        self.importer = Importer()
+        self.records = [
+            {"code": "A", "geometry": GML % ("1,2", "A")},
+            {"code": "B", "geometry": GML % ("3,4", "B")},
+            {"code": "C", "geometry": GML % ("1,2", "A")},
+        ]
+
+    def test_read_gml_geometries(self):
+        geometries = read_gml_geometries([GML % ("1,2", "A"), GML % ("3,4", "B")])
+        self.assertEqual(
+            [[(1, 2)], [(3, 4)]], [[g.coords for g in r] for r in geometries]
+        )
+
+    def test_extract_gml_geometry(self):
+        self.importer.add_pending_gml_records(self.records)
+
+        with mock.patch(
+            "data_importers.github_importer.read_gml_geometries",
+            wraps=read_gml_geometries,
+        ) as read:
+            points = [
+                self.importer.extract_geometry(record, "gml", 27700)
+                for record in self.records
+            ]
+
+        # all the records are parsed in one batch
+        read.assert_called_once()
+        self.assertEqual(2, len(read.call_args[0][0]))
+        self.assertEqual([(1, 2), (3, 4), (1, 2)], [p.coords for p in points])
+        self.assertEqual([27700] * 3, [p.srid for p in points])
+
+    def test_extract_gml_geometry_not_fetched(self):
+        point = self.importer.extract_geometry(self.records[1], "gml", 4326)
+        self.assertEqual((3, 4), point.coords)
+
+    def test_clean_gml(self):
+        self.importer.clean_gml = lambda gml: gml.replace("1,2", "5,6")
+        self.importer.add_pending_gml_records(self.records)
+        point = self.importer.extract_geometry(self.records[0], "gml", 4326)
+        self.assertEqual((5, 6), point.coords)
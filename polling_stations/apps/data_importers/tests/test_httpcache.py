@@ -0,0 +1,83 @@
+import tempfile
+
+import mock
+from django.test import TestCase
+
+from data_importers.httpcache import DownloadCache
+
+
+URL = "https://example.com/districts.geojson"
+
+
+def mock_response(status_code, body=b"", headers=None):
+    response = mock.MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [body]
+    return response
+
+
+class DownloadCacheTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = DownloadCache(base_path=self.tmpdir.name)
+        self.cache.max_age = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def fetch(self, response, cache=None):
+        cache = cache or self.cache
+        with mock.patch("data_importers.httpcache.requests.get") as get:
+            get.return_value = response
+            path = cache.fetch(URL)
+        with open(path, "rb") as f:
+            return f.read(), get
+
+    def test_conditional_request(self):
+        body, get = self.fetch(
+            mock_response(
+                200,
+                b"data",
+                {"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2020 07:28:00 GMT"},
+            )
+        )
+        self.assertEqual(b"data", body)
+        self.assertEqual({}, get.call_args[1]["headers"])
+
+        body, get = self.fetch(mock_response(304))
+        self.assertEqual(b"data", body)
+        self.assertEqual(
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 21 Oct 2020 07:28:00 GMT",
+            },
+            get.call_args[1]["headers"],
+        )
+
+        body, get = self.fetch(mock_response(200, b"new data"))
+        self.assertEqual(b"new data", body)
+
+    def test_max_age(self):
+        self.cache.max_age = 300
+        self.fetch(mock_response(200, b"data", {"ETag": '"abc"'}))
+        body, get = self.fetch(mock_response(200, b"new data"))
+        self.assertEqual(b"data", body)
+        get.assert_not_called()
+
+    def test_offline(self):
+        offline = DownloadCache(base_path=self.tmpdir.name, offline=True)
+        with self.assertRaises(ValueError):
+            offline.fetch(URL)
+
+        self.fetch(mock_response(200, b"data"))
+        body, get = self.fetch(mock_response(200, b"new data"), cache=offline)
+        self.assertEqual(b"data", body)
+        get.assert_not_called()
+
+    def test_error(self):
+        response = mock_response(500)
+        response.raise_for_status.side_effect = Exception("500 Server Error")
+        with self.assertRaises(Exception):
+            self.fetch(response)
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+
+from django.test import TestCase
+
+from data_importers.loghelper import LogHelper
+
+
+Record = namedtuple("Record", ["id", "name"])
+
+
+class Unformattable:
+    def __repr__(self):
+        raise AssertionError("formatted a message we weren't going to log")
+
+
+class LogHelperTest(TestCase):
+    def test_disabled_level_is_not_formatted(self):
+        logger = LogHelper(verbosity=1)
+        logger.log_message(
+            logging.INFO, "Record:\n%s", variable=Unformattable(), pretty=True
+        )
+        self.assertEqual(1, logger.event_counts["Record:\n%s"])
+
+    def test_sampling(self):
+        logger = LogHelper(verbosity=2)
+        logger.sample_after = 2
+        with self.assertLogs("data_importers.loghelper", level="INFO") as logs:
+            for i in range(5):
+                logger.log_message(logging.INFO, "station %s", variable=str(i))
+            logger.log_message(logging.WARNING, "station %s", variable="5")
+            logger.close()
+
+        self.assertEqual(
+            [
+                "INFO:data_importers.loghelper:station 0",
+                "INFO:data_importers.loghelper:station 1",
+                "WARNING:data_importers.loghelper:station 5",
+                "INFO:data_importers.loghelper:3 more 'station %s' messages not shown",
+            ],
+            logs.output,
+        )
+        self.assertEqual(6, logger.event_counts["station %s"])
+
+    def test_events_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "X01000001.jsonl")
+            logger = LogHelper(verbosity=2, events_path=path)
+            logger.log_message(
+                logging.INFO, "added:\n%s", variable=Record("1", "foo"), pretty=True
+            )
+            logger.log_message(logging.DEBUG, "not enabled %s", variable="x")
+            logger.close()
+
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+
+        self.assertEqual(
+            [
+                {
+                    "level": "INFO",
+                    "event": "added:\n%s",
+                    "data": {"id": "1", "name": "foo"},
+                }
+            ],
+            events,
+        )
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from django.test import TestCase
+
+from data_importers.registry import ImporterRegistry, parse_import_script
+
+
+STATIC_SCRIPT = """
+from data_importers.management.commands import BaseXpressDemocracyClubCsvImporter
+
+
+class Command(BaseXpressDemocracyClubCsvImporter):
+    council_id = "X01000000"
+    addresses_name = "foo.tsv"
+    stations_name = "foo.tsv"
+    elections = ["parl.2019-12-12"]
+    run_in_series = True
+"""
+
+DYNAMIC_SCRIPT = """
+from data_importers.management.commands import BaseXpressDemocracyClubCsvImporter
+
+ELECTIONS = ["parl.2019-12-12"]
+
+
+class Command(BaseXpressDemocracyClubCsvImporter):
+    council_id = "X01000001"
+    elections = ELECTIONS
+"""
+
+
+class ImporterRegistryTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.write_script("import_static.py", STATIC_SCRIPT)
+        self.write_script("import_dynamic.py", DYNAMIC_SCRIPT)
+        self.write_script("import_broken.py", "class Command(:\n")
+        self.cache_path = os.path.join(self.tmpdir.name, "registry.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_script(self, name, content):
+        with open(os.path.join(self.tmpdir.name, name), "w") as f:
+            f.write(content)
+
+    def test_parse_static_script(self):
+        metadata = parse_import_script(
+            os.path.join(self.tmpdir.name, "import_static.py")
+        )
+        self.assertTrue(metadata["static"])
+        self.assertEqual("X01000000", metadata["council_id"])
+        self.assertEqual(["parl.2019-12-12"], metadata["elections"])
+        self.assertEqual("foo.tsv", metadata["addresses_name"])
+        self.assertTrue(metadata["run_in_series"])
+
+    def test_parse_dynamic_script(self):
+        metadata = parse_import_script(
+            os.path.join(self.tmpdir.name, "import_dynamic.py")
+        )
+        self.assertFalse(metadata["static"])
+        self.assertNotIn("elections", metadata)
+        self.assertFalse(metadata["run_in_series"])
+
+    def test_get_scripts(self):
+        registry = ImporterRegistry(self.tmpdir.name, self.cache_path)
+        scripts = registry.get_scripts()
+
+        self.assertEqual(3, len(scripts))
+        broken = scripts[os.path.join(self.tmpdir.name, "import_broken.py")]
+        self.assertFalse(broken["static"])
+        self.assertIn("error", broken)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        # second time around, everything comes from the cache
+        self.assertEqual(scripts, registry.get_scripts())
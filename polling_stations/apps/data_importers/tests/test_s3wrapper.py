@@ -0,0 +1,75 @@
+import os
+import tempfile
+
+import boto3
+import mock
+from django.test import TestCase, override_settings
+from moto import mock_s3
+
+from data_importers.s3wrapper import S3Wrapper
+
+
+@override_settings(S3_DATA_BUCKET="test-data")
+class S3WrapperTest(TestCase):
+    def setUp(self):
+        self.mock_s3 = mock_s3()
+        self.mock_s3.start()
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket="test-data")
+        self.put("X01000001-Foo/stations.csv", "stations")
+        self.put("X01000001-Foo/addresses.csv", "addresses")
+        self.put("X01000001-Foo/$folder$", "")
+        self.put("X01000002-Bar/stations.csv", "other council")
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.wrapper = S3Wrapper(client=self.client, base_path=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        self.mock_s3.stop()
+
+    def put(self, key, body):
+        self.client.put_object(Bucket="test-data", Key=key, Body=body.encode())
+
+    def read(self, key):
+        with open(os.path.join(self.tmpdir.name, key)) as f:
+            return f.read()
+
+    def test_fetch_data(self):
+        self.assertEqual((2, 0), self.wrapper.fetch_data_by_council("X01000001"))
+        self.assertEqual("stations", self.read("X01000001-Foo/stations.csv"))
+        self.assertEqual("addresses", self.read("X01000001-Foo/addresses.csv"))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmpdir.name, "X01000002-Bar"))
+        )
+
+    def test_only_fetches_changed_objects(self):
+        self.wrapper.fetch_data_by_council("X01000001")
+
+        self.put("X01000001-Foo/stations.csv", "new stations")
+        with mock.patch.object(
+            self.client, "download_file", wraps=self.client.download_file
+        ) as download_file:
+            self.assertEqual((1, 1), self.wrapper.fetch_data_by_council("X01000001"))
+
+        download_file.assert_called_once()
+        self.assertEqual("new stations", self.read("X01000001-Foo/stations.csv"))
+        self.assertEqual("addresses", self.read("X01000001-Foo/addresses.csv"))
+
+    def test_removes_stale_files(self):
+        self.wrapper.fetch_data_by_council("X01000001")
+        self.wrapper.fetch_data_by_council("X01000002")
+
+        self.client.delete_object(Bucket="test-data", Key="X01000001-Foo/stations.csv")
+        self.assertEqual((0, 1), self.wrapper.fetch_data_by_council("X01000001"))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmpdir.name, "X01000001-Foo/stations.csv"))
+        )
+        self.assertEqual("other council", self.read("X01000002-Bar/stations.csv"))
+
+        # the object stations.csv was linked to is deleted too
+        self.assertEqual(2, len(os.listdir(self.wrapper.objects_path)))
+
+    def test_no_data(self):
+        with self.assertRaises(ValueError):
+            self.wrapper.fetch_data_by_council("X01000003")
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import mock
+import shapefile
+from django.test import TestCase
+
+from data_importers.filehelpers import ShpHelper, ShpPartitioner
+
+
+class ShpPartitionerTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.shp_path = os.path.join(self.tmpdir.name, "national.shp")
+        self.partitions_path = os.path.join(self.tmpdir.name, ".partitions")
+
+        writer = shapefile.Writer(self.shp_path, encoding="latin-1")
+        writer.field("code", "C")
+        writer.field("council", "C")
+        for i, council in enumerate(["Fife", "Angus", "Fife", "", "Angus"]):
+            writer.point(i, i * 10)
+            writer.record("A%i" % i, council)
+        writer.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get_partitioner(self):
+        return ShpPartitioner(
+            self.shp_path,
+            self.partitions_path,
+            key=lambda record: record[1],
+            encoding="latin-1",
+        )
+
+    def read(self, path):
+        return [
+            (feature.record[0], list(feature.shape.points[0]))
+            for feature in ShpHelper(path, encoding="latin-1").get_features()
+        ]
+
+    def test_get_partition(self):
+        partitioner = self.get_partitioner()
+        self.assertEqual(
+            [("A0", [0, 0]), ("A2", [2, 20])],
+            self.read(partitioner.get_partition("Fife")),
+        )
+        self.assertEqual(
+            [("A1", [1, 10]), ("A4", [4, 40])],
+            self.read(partitioner.get_partition("Angus")),
+        )
+        self.assertIsNone(partitioner.get_partition("Highland"))
+
+    def test_source_is_only_read_once(self):
+        self.get_partitioner().get_partition("Fife")
+
+        with mock.patch.object(ShpPartitioner, "write_partitions") as write_partitions:
+            self.get_partitioner().get_partition("Angus")
+        write_partitions.assert_not_called()
+
+    def test_rebuilt_when_source_changes(self):
+        old_path = self.get_partitioner().partition()
+
+        writer = shapefile.Writer(self.shp_path, encoding="latin-1")
+        writer.field("code", "C")
+        writer.field("council", "C")
+        writer.point(5, 50)
+        writer.record("B0", "Fife")
+        writer.close()
+
+        self.assertEqual(
+            [("B0", [5, 50])], self.read(self.get_partitioner().get_partition("Fife"))
+        )
+        self.assertFalse(os.path.exists(old_path))
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import zipfile
+
+import mock
+import shapefile
+from django.test import TestCase
+
+from data_importers.filehelpers import ShpHelper
+
+
+class ShpHelperTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.shp_path = os.path.join(self.tmpdir.name, "test.shp")
+
+        writer = shapefile.Writer(os.path.join(self.tmpdir.name, "test"))
+        writer.field("code", "C")
+        writer.field("name", "C")
+        for i in range(3):
+            writer.point(i, i * 10)
+            writer.record("A%i" % i, "station %i" % i)
+        writer.close()
+
+        self.zip_path = os.path.join(self.tmpdir.name, "test.shp.zip")
+        with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for ext in ["shp", "shx", "dbf"]:
+                zip_file.write(
+                    os.path.join(self.tmpdir.name, "test." + ext),
+                    "Version 1/test." + ext,
+                )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assertFeatures(self, features, points):
+        self.assertEqual(3, len(features))
+        # iterate twice, loading geometry as we go
+        for _ in range(2):
+            self.assertEqual(
+                [("A0", points[0]), ("A1", points[1]), ("A2", points[2])],
+                [
+                    (row.record[0], row.shape and list(row.shape.points[0]))
+                    for row in features
+                ],
+            )
+
+    def test_shp(self):
+        features = ShpHelper(self.shp_path).get_features()
+        self.assertFeatures(features, [[0, 0], [1, 10], [2, 20]])
+
+    def test_shp_zip(self):
+        features = ShpHelper(self.zip_path, zip=True).get_features()
+        self.assertFeatures(features, [[0, 0], [1, 10], [2, 20]])
+
+    def test_records_only(self):
+        helper = ShpHelper(self.zip_path, zip=True, records_only=True)
+        self.assertFeatures(helper.get_features(), [None, None, None])
+        with helper.open_reader() as reader:
+            self.assertIsNone(reader.shp)
+
+        features = ShpHelper(self.shp_path, records_only=True).get_features()
+        self.assertFeatures(features, [None, None, None])
+
+    def test_closes_reader(self):
+        close = shapefile.Reader.close
+        for helper in [ShpHelper(self.shp_path), ShpHelper(self.zip_path, zip=True)]:
+            features = helper.get_features()
+            with mock.patch.object(
+                shapefile.Reader, "close", autospec=True, side_effect=close
+            ) as mock_close:
+                len(features)
+                for feature in features:
+                    break
+                list(features)
+            self.assertEqual(3, mock_close.call_count)
+
+    def test_multiple_shapefiles(self):
+        with zipfile.ZipFile(self.zip_path, "a") as zip_file:
+            zip_file.write(self.shp_path, "other.shp")
+        with self.assertRaises(ValueError):
+            list(ShpHelper(self.zip_path, zip=True).get_features())
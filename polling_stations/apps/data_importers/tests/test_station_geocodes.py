@@ -0,0 +1,126 @@
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+
+from addressbase.models import Address, UprnToCouncil
+from data_finder.helpers import geocode_point_only, PostcodeError
+from data_importers.ems_importers import StationGeocodes, StationGeocodingMixin
+from uk_geo_utils.helpers import get_onspd_model
+
+
+class GeocodingImporter(StationGeocodingMixin):
+    allow_station_point_from_postcode = True
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_stations(self):
+        return self.keys
+
+    def get_station_geocoding_keys(self, record):
+        return record
+
+
+class StationGeocodesTest(TestCase):
+    def create_address(self, uprn, address, postcode, location, postal="D"):
+        Address.objects.create(
+            uprn=uprn,
+            address=address,
+            postcode=postcode,
+            location=location,
+            addressbase_postal=postal,
+        )
+        UprnToCouncil.objects.create(uprn_id=uprn, lad="X01000001")
+
+    def setUp(self):
+        self.create_address(
+            "100", "1 Foo Street", "AA1 1AA", Point(-1.0, 52.0, srid=4326)
+        )
+        self.create_address(
+            "101", "3 Foo Street", "AA1 1AA", Point(-1.2, 52.2, srid=4326)
+        )
+        self.create_address(
+            "200", "1 Bar Street", "BB1 1BB", Point(-2.0, 53.0, srid=4326)
+        )
+
+    def test_batch_lookup(self):
+        geocodes = StationGeocodes(
+            uprns=["000100", " 200", "", None, "999"],
+            postcodes=["aa11aa", "ZZ1 1ZZ", ""],
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual("1 Foo Street", geocodes.get_address("0100").address)
+            self.assertEqual("BB1 1BB", geocodes.get_address("200").postcode)
+            with self.assertRaises(Address.DoesNotExist):
+                geocodes.get_address("999")
+
+            point = geocodes.get_postcode_point("AA1 1AA")
+            self.assertAlmostEqual(-1.1, point.x)
+            self.assertAlmostEqual(52.1, point.y)
+            self.assertIsNone(geocodes.get_postcode_point("ZZ11ZZ"))
+            self.assertIsNone(geocodes.get_postcode_point(""))
+
+    def test_lookup_outside_batch(self):
+        geocodes = StationGeocodes(uprns=["100"], postcodes=["AA1 1AA"])
+
+        with self.assertNumQueries(1):
+            self.assertEqual("BB1 1BB", geocodes.get_address("200").postcode)
+        point = geocodes.get_postcode_point("BB11BB")
+        self.assertEqual(Point(-2.0, 53.0, srid=4326), point)
+        with self.assertNumQueries(0):
+            geocodes.get_postcode_point("BB1 1BB")
+
+    def test_matches_geocode_point_only(self):
+        # postal and non-postal addresses, and duplicate points
+        self.create_address(
+            "300", "1 Baz Street", "CC1 1CC", Point(-3.0, 54.0, srid=4326), "D"
+        )
+        self.create_address(
+            "301", "Baz Street Substation", "CC1 1CC", Point(-3.4, 54.4, srid=4326), "N"
+        )
+        self.create_address(
+            "102", "1 Foo Street Annexe", "AA1 1AA", Point(-1.0, 52.0, srid=4326)
+        )
+        # only in ONSPD, one of them terminated
+        onspd = get_onspd_model()
+        onspd.objects.create(
+            pcd="DD1 1DD",
+            pcds="DD1 1DD",
+            doterm="",
+            location=Point(-4.0, 55.0, srid=4326),
+        )
+        onspd.objects.create(
+            pcd="EE1 1EE",
+            pcds="EE1 1EE",
+            doterm="201901",
+            location=Point(-5.0, 56.0, srid=4326),
+        )
+
+        # 2 queries to check AddressBase and ONSUD have been imported,
+        # 1 for the addresses, 1 to check ONSPD has been imported, 1 for ONSPD
+        with self.assertNumQueries(5):
+            StationGeocodes(postcodes=["AA1 1AA", "BB1 1BB", "CC1 1CC", "DD1 1DD"])
+
+        postcodes = ["AA1 1AA", "BB1 1BB", "CC1 1CC", "DD1 1DD", "EE1 1EE", "ZZ1 1ZZ"]
+        geocodes = StationGeocodes(postcodes=postcodes)
+        for postcode in postcodes:
+            try:
+                expected = geocode_point_only(postcode).centroid
+            except PostcodeError:
+                expected = None
+            self.assertEqual(expected, geocodes.get_postcode_point(postcode))
+
+    def test_postcodes_only_looked_up_without_uprn(self):
+        importer = GeocodingImporter(
+            [
+                ("0100", "AA1 1AA"),  # found by UPRN
+                ("999", "BB1 1BB"),  # UPRN not in AddressBase
+                ("", "CC1 1CC"),
+                (None, None),  # grid reference
+            ]
+        )
+        geocodes = importer.get_station_geocodes()
+
+        self.assertTrue(geocodes.has_address("100"))
+        self.assertFalse(geocodes.has_address("999"))
+        self.assertEqual({"BB1 1BB", "CC1 1CC"}, geocodes.seen_postcodes)
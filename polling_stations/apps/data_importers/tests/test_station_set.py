@@ -74,3 +74,118 @@ class StationSetTest(TestCase):
             ),
             {("PS-2", "AAA", "B"), ("PS-1", "AAA", "A")},
         )
+
+    def test_save_copy(self):
+        station_set = StationSet()
+        station_set.add(
+            {
+                "internal_council_id": "PS-1",
+                "council": Council.objects.get(pk="AAA"),
+                "address": "Village Hall\\Annexe\n\tHigh Street",
+                "postcode": "",
+                "location": Point(530000, 180000, srid=27700),
+            }
+        )
+        station_set.add(
+            {
+                "internal_council_id": "PS-2",
+                "council": Council.objects.get(pk="AAA"),
+            }
+        )
+
+        written, seconds = station_set.save()
+        self.assertEqual(2, written)
+
+        station = PollingStation.objects.get(internal_council_id="PS-1")
+        self.assertEqual("Village Hall\\Annexe\n\tHigh Street", station.address)
+        self.assertEqual("", station.postcode)
+        self.assertEqual(4326, station.location.srid)
+        self.assertAlmostEqual(-0.13, station.location.x, places=2)
+        self.assertAlmostEqual(51.5, station.location.y, places=1)
+        self.assertIsNone(
+            PollingStation.objects.get(internal_council_id="PS-2").location
+        )
+
+    def test_save_changes(self):
+        self.station_set.save()
+
+        station_set = StationSet()
+        for element in [
+            {
+                # unchanged
+                "internal_council_id": "PS-1",
+                "council": Council.objects.get(pk="AAA"),
+                "polling_district_id": "A",
+            },
+            {
+                # changed
+                "internal_council_id": "PS-2",
+                "council": Council.objects.get(pk="AAA"),
+                "polling_district_id": "C",
+            },
+            {
+                # new
+                "internal_council_id": "PS-3",
+                "council": Council.objects.get(pk="AAA"),
+                "polling_district_id": "D",
+                "location": Point(1, 2, srid=4326),
+            },
+        ]:
+            station_set.add(element)
+
+        unchanged_pk = PollingStation.objects.get(internal_council_id="PS-1").pk
+        self.assertEqual((1, 1, 0), station_set.save_changes())
+        self.assertEqual(
+            unchanged_pk, PollingStation.objects.get(internal_council_id="PS-1").pk
+        )
+        self.assertEqual(
+            set(
+                PollingStation.objects.all().values_list(
+                    "internal_council_id", "council", "polling_district_id"
+                )
+            ),
+            {("PS-1", "AAA", "A"), ("PS-2", "AAA", "C"), ("PS-3", "AAA", "D")},
+        )
+
+        # saving the same set again is a no-op
+        self.assertEqual((0, 0, 0), station_set.save_changes())
+
+        # stations which are no longer in the set are deleted
+        self.assertEqual((0, 1, 1), self.station_set.save_changes())
+        self.assertEqual(
+            set(
+                PollingStation.objects.all().values_list(
+                    "internal_council_id", "council", "polling_district_id"
+                )
+            ),
+            {("PS-2", "AAA", "B"), ("PS-1", "AAA", "A")},
+        )
+
+    def test_save_changes_unchanged_location(self):
+        station_set = StationSet()
+        for element in [
+            {
+                "internal_council_id": "PS-1",
+                "council": Council.objects.get(pk="AAA"),
+                "location": Point(1, 2, srid=4326),
+            },
+            {
+                "internal_council_id": "PS-2",
+                "council": Council.objects.get(pk="AAA"),
+                "location": Point(530000, 180000, srid=27700),
+            },
+        ]:
+            station_set.add(element)
+        station_set.save()
+
+        self.assertEqual((0, 0, 0), station_set.save_changes())
+
+        moved = StationSet()
+        moved.add(
+            {
+                "internal_council_id": "PS-1",
+                "council": Council.objects.get(pk="AAA"),
+                "location": Point(1, 3, srid=4326),
+            }
+        )
+        self.assertEqual((0, 1, 1), moved.save_changes())
@@ -13,3 +13,10 @@ We can change the section name using the BOTO_SECTION setting
 """
 BOTO_SECTION = "wheredoivote"
 S3_DATA_BUCKET = "pollingstations-data"
+
+"""
+The import command caches metadata read from the import scripts here
+so it doesn't have to parse every script each time it runs.
+See data_importers.registry
+"""
+IMPORTER_REGISTRY_CACHE = "./.importer-registry.json"